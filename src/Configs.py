@@ -7,6 +7,10 @@ class SimulationConfig:
     # configurable
     EXECUTION_MODE = EXECUTION_MODE_DOCKER
 
+    # protocol of the PLCs in local mode; 'loopback' shares the registers in memory or over a UNIX socket,
+    # which is faster, but leaves no TCP endpoint for the attacker scripts and external Modbus tools
+    LOCAL_PLC_PROTOCOL = 'ModbusWriteRequest-TCP'
+
 
 
 class PHYSICS:
@@ -103,13 +107,13 @@ class Controllers:
                 'name': 'PLC1',
                 'ip': '127.0.0.1',
                 'port': 5502,
-                'protocol': 'ModbusWriteRequest-TCP'
+                'protocol': SimulationConfig.LOCAL_PLC_PROTOCOL
              },
             2: {
                 'name': 'PLC2',
                 'ip': '127.0.0.1',
                 'port': 5503,
-                'protocol': 'ModbusWriteRequest-TCP'
+                'protocol': SimulationConfig.LOCAL_PLC_PROTOCOL
              },
         }
     }
@@ -123,6 +127,17 @@ class Connection:
         'path': 'storage/PhysicalSimulation1.sqlite',
         'name': 'fp_table',
     }
+    SQLITE_POOLED_CONNECTION = {
+        'type': 'sqlite',
+        'path': 'storage/PhysicalSimulation1.sqlite',
+        'name': 'fp_table',
+        'options': {'pooled': True},
+    }
+    SHM_CONNECTION = {
+        'type': 'shm',
+        'path': 'ics_sim_physical_simulation1',
+        'name': 'fp_table',
+    }
     MEMCACHE_DOCKER_CONNECTION = {
         'type': 'memcache',
         'path': '192.168.1.31:11211',
@@ -135,7 +150,7 @@ class Connection:
     }
     File_CONNECTION = {
         'type': 'file',
-        'path': 'storage/sensors_actuators.json',
+        'path': 'storage/sensors_actuators.tags',
         'name': 'fake_name',
     }
 
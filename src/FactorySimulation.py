@@ -56,54 +56,72 @@ class FactorySimulation(HIL):
         """
         Simulates the physical behavior of the system without fault injection.
         """
+        # Read the whole process state at one consistent version
+        tags = [
+            TAG.TAG_TANK_LEVEL_VALUE,
+            TAG.TAG_TANK_INPUT_VALVE_STATUS,
+            TAG.TAG_TANK_OUTPUT_VALVE_STATUS,
+            TAG.TAG_TANK_OUTPUT_FLOW_VALUE,
+            TAG.TAG_BOTTLE_LEVEL_VALUE,
+            TAG.TAG_BOTTLE_DISTANCE_TO_FILLER_VALUE,
+            TAG.TAG_CONVEYOR_BELT_ENGINE_STATUS,
+        ]
+        version, state = self._snapshot(tags)
+        if len(state) < len(tags):
+            # the store could not be read, leave the process as it is until the next step
+            self.reporter.log(logging.WARNING, 'Cannot read the process state, step skipped')
+            return
+
         # Update tank water level
-        tank_water_amount = self._get(TAG.TAG_TANK_LEVEL_VALUE) * PHYSICS.TANK_LEVEL_CAPACITY
-        if self._get(TAG.TAG_TANK_INPUT_VALVE_STATUS):
+        tank_water_amount = state[TAG.TAG_TANK_LEVEL_VALUE] * PHYSICS.TANK_LEVEL_CAPACITY
+        if state[TAG.TAG_TANK_INPUT_VALVE_STATUS]:
             tank_water_amount += PHYSICS.TANK_INPUT_FLOW_RATE * elapsed_time
 
-        if self._get(TAG.TAG_TANK_OUTPUT_VALVE_STATUS):
+        if state[TAG.TAG_TANK_OUTPUT_VALVE_STATUS]:
             tank_water_amount -= PHYSICS.TANK_OUTPUT_FLOW_RATE * elapsed_time
 
         tank_water_level = tank_water_amount / PHYSICS.TANK_LEVEL_CAPACITY
 
         if tank_water_level > PHYSICS.TANK_MAX_LEVEL:
             tank_water_level = PHYSICS.TANK_MAX_LEVEL
-            self.report('Tank water overflowed', logging.WARNING)
+            self.reporter.log(logging.WARNING, 'Tank water overflowed')
         elif tank_water_level <= 0:
             tank_water_level = 0
-            self.report('Tank water is empty', logging.WARNING)
+            self.reporter.log(logging.WARNING, 'Tank water is empty')
 
         # Update tank water flow
         tank_water_flow = 0
-        if self._get(TAG.TAG_TANK_OUTPUT_VALVE_STATUS) and tank_water_amount > 0:
+        if state[TAG.TAG_TANK_OUTPUT_VALVE_STATUS] and tank_water_amount > 0:
             tank_water_flow = PHYSICS.TANK_OUTPUT_FLOW_RATE
 
         # Update bottle water
-        if self._get(TAG.TAG_BOTTLE_DISTANCE_TO_FILLER_VALUE) > 1:
+        if state[TAG.TAG_BOTTLE_DISTANCE_TO_FILLER_VALUE] > 1:
             bottle_water_amount = 0
-            if self._get(TAG.TAG_TANK_OUTPUT_FLOW_VALUE):
-                self.report('Water is wasting', logging.WARNING)
+            if state[TAG.TAG_TANK_OUTPUT_FLOW_VALUE]:
+                self.reporter.log(logging.WARNING, 'Water is wasting')
         else:
-            bottle_water_amount = self._get(TAG.TAG_BOTTLE_LEVEL_VALUE) * PHYSICS.BOTTLE_LEVEL_CAPACITY
-            bottle_water_amount += self._get(TAG.TAG_TANK_OUTPUT_FLOW_VALUE) * elapsed_time
+            bottle_water_amount = state[TAG.TAG_BOTTLE_LEVEL_VALUE] * PHYSICS.BOTTLE_LEVEL_CAPACITY
+            bottle_water_amount += state[TAG.TAG_TANK_OUTPUT_FLOW_VALUE] * elapsed_time
 
         bottle_water_level = bottle_water_amount / PHYSICS.BOTTLE_LEVEL_CAPACITY
 
         if bottle_water_level > PHYSICS.BOTTLE_MAX_LEVEL:
             bottle_water_level = PHYSICS.BOTTLE_MAX_LEVEL
-            self.report('Bottle water overflowed', logging.WARNING)
+            self.reporter.log(logging.WARNING, 'Bottle water overflowed')
 
         # Update bottle position
-        bottle_distance_to_filler = self._get(TAG.TAG_BOTTLE_DISTANCE_TO_FILLER_VALUE)
-        if self._get(TAG.TAG_CONVEYOR_BELT_ENGINE_STATUS):
+        bottle_distance_to_filler = state[TAG.TAG_BOTTLE_DISTANCE_TO_FILLER_VALUE]
+        if state[TAG.TAG_CONVEYOR_BELT_ENGINE_STATUS]:
             bottle_distance_to_filler -= elapsed_time * PHYSICS.CONVEYOR_BELT_SPEED
             bottle_distance_to_filler %= PHYSICS.BOTTLE_DISTANCE
 
-        # Update physical properties
-        self._set(TAG.TAG_TANK_LEVEL_VALUE, tank_water_level)
-        self._set(TAG.TAG_TANK_OUTPUT_FLOW_VALUE, tank_water_flow)
-        self._set(TAG.TAG_BOTTLE_LEVEL_VALUE, bottle_water_level)
-        self._set(TAG.TAG_BOTTLE_DISTANCE_TO_FILLER_VALUE, bottle_distance_to_filler)
+        # Commit the physical properties of this step atomically
+        self._commit({
+            TAG.TAG_TANK_LEVEL_VALUE: tank_water_level,
+            TAG.TAG_TANK_OUTPUT_FLOW_VALUE: tank_water_flow,
+            TAG.TAG_BOTTLE_LEVEL_VALUE: bottle_water_level,
+            TAG.TAG_BOTTLE_DISTANCE_TO_FILLER_VALUE: bottle_distance_to_filler,
+        })
 
     def init(self):
         """
@@ -133,7 +151,7 @@ class FactorySimulation(HIL):
         clean_message = message.strip()
         if context:
             clean_message += f" | Context: {context}"
-        print(clean_message)
+        self._print(clean_message)
         logger.log(level, clean_message)
 
     @staticmethod
@@ -19,6 +19,8 @@ logging.basicConfig(level=logging.INFO, handlers=[syslog_handler])
 logger = logging.getLogger("HMI1")
 
 class HMI1(HMI):
+    PEER_CIRCUIT_BREAKER = True
+
     def __init__(self):
         super().__init__('HMI1', TAG.TAG_LIST, Controllers.PLCs, 500)
 
@@ -44,6 +46,7 @@ class HMI1(HMI):
                 self._rows[tag_name] = {'tag': tag_name.center(self.title_length, ' '), 'msg1': '', 'msg2': ''}
 
         self._latency = 0
+        self._values = {}
 
     def _display(self):
         try:
@@ -62,6 +65,18 @@ class HMI1(HMI):
     def __update_massages(self):
         self._latency = 0
 
+        # one block read per PLC instead of one round-trip per tag
+        timestamp = datetime.now()
+        self._values = {}
+        for plc_id in self.plcs:
+            plc_tags = [tag for tag in self.tags if self.tags[tag]['plc'] == plc_id]
+            try:
+                self._values.update(self._receive_many(plc_tags))
+            except Exception as e:
+                logger.warning("Error receiving values from PLC %s: %s", plc_id, str(e))
+                self.report(e.__str__(), logging.WARNING)
+        self._latency = (datetime.now() - timestamp).microseconds
+
         for row in self._rows:
             self._rows[row]['msg1'] = ''
             self._rows[row]['msg2'] = ''
@@ -86,17 +101,11 @@ class HMI1(HMI):
                 self._rows[row]['msg2'] = ''.center(self.msg1_length, ' ')
 
     def __get_formatted_value(self, tag):
-        timestamp = datetime.now()
         pos = tag.rfind('_')
         tag_name = tag[0:pos]
         tag_attribute = tag[pos + 1:]
 
-        try:
-            value = self._receive(tag)
-        except Exception as e:
-            logger.warning("Error receiving value for tag %s: %s", tag, str(e))
-            self.report(e.__str__(), logging.WARNING)
-            value = 'NULL'
+        value = self._values.get(tag, 'NULL')
 
         if tag_attribute == 'mode':
             if value == 1:
@@ -127,10 +136,6 @@ class HMI1(HMI):
         else:
             value = self._make_text(str(value).center(self.msg2_length, " "), self.COLOR_CYAN)
 
-        elapsed = datetime.now() - timestamp
-
-        if elapsed.microseconds > self._latency:
-            self._latency = elapsed.microseconds
         return value
 
     def __show_table(self):
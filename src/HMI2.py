@@ -22,6 +22,8 @@ logger = logging.getLogger("HMI2")
 
 
 class HMI2(HMI):
+    PEER_CIRCUIT_BREAKER = True
+
     def __init__(self):
         super().__init__('HMI2', TAG.TAG_LIST, Controllers.PLCs)
 
@@ -22,6 +22,8 @@ logging.basicConfig(level=logging.INFO, handlers=[syslog_handler])
 logger = logging.getLogger("HMI3")
 
 class HMI3(HMI):
+    PEER_CIRCUIT_BREAKER = True
+
     def __init__(self):
         super().__init__('HMI3', TAG.TAG_LIST, Controllers.PLCs)
 
@@ -1,4 +1,5 @@
 from ics_sim.Device import PLC, SensorConnector, ActuatorConnector
+from ics_sim.reporter import RateLimitedReporter
 from Configs import TAG, Controllers, Connection
 import logging
 from logging.handlers import SysLogHandler
@@ -35,6 +36,9 @@ class PLC1(PLC):
 
         super().__init__(1, sensor_connector, actuator_connector, TAG.TAG_LIST, Controllers.PLCs)
 
+        # per-scan messages: repeats are collapsed, per-scan timing is sampled
+        self._log = RateLimitedReporter(logger.log, sample_every={logging.DEBUG: 10}, enabled=logger.isEnabledFor)
+
         # Define faults
         self.faults = [
             self._apply_sensor_drift,
@@ -48,10 +52,10 @@ class PLC1(PLC):
     def _logic(self):
         try:
             if self.simulation_mode == "faults":
-                logger.info("Executing system faults logic.")
+                self._log.log(logging.INFO, "Executing system faults logic.")
                 self._apply_next_fault()  # Continuously apply faults in a loop
             else:
-                logger.info("Executing normal operation logic.")
+                self._log.log(logging.INFO, "Executing normal operation logic.")
                 self._simulate_normal_operation()  # Perform normal operations
         except Exception as e:
             logger.error("Error in PLC1 logic: %s", str(e), exc_info=True)
@@ -63,10 +67,10 @@ class PLC1(PLC):
             tank_level = self._get(TAG.TAG_TANK_LEVEL_VALUE)
             if tank_level > self._get(TAG.TAG_TANK_LEVEL_MAX):
                 self._set(TAG.TAG_TANK_INPUT_VALVE_STATUS, 0)
-                logger.info(f"Tank input valve closed due to high tank level: {tank_level:.2f}")
+                self._log.log(logging.INFO, "Tank input valve closed due to high tank level: %.2f", tank_level)
             elif tank_level < self._get(TAG.TAG_TANK_LEVEL_MIN):
                 self._set(TAG.TAG_TANK_INPUT_VALVE_STATUS, 1)
-                logger.info(f"Tank input valve opened due to low tank level: {tank_level:.2f}")
+                self._log.log(logging.INFO, "Tank input valve opened due to low tank level: %.2f", tank_level)
 
         # Tank output valve logic
         if not self._check_manual_input(TAG.TAG_TANK_OUTPUT_VALVE_MODE, TAG.TAG_TANK_OUTPUT_VALVE_STATUS):
@@ -74,10 +78,12 @@ class PLC1(PLC):
             belt_position = self._get(TAG.TAG_BOTTLE_DISTANCE_TO_FILLER_VALUE)
             if bottle_level > self._get(TAG.TAG_BOTTLE_LEVEL_MAX) or belt_position > 1.0:
                 self._set(TAG.TAG_TANK_OUTPUT_VALVE_STATUS, 0)
-                logger.info(f"Tank output valve closed. Bottle level: {bottle_level:.2f}, Belt position: {belt_position:.2f}")
+                self._log.log(logging.INFO, "Tank output valve closed. Bottle level: %.2f, Belt position: %.2f",
+                              bottle_level, belt_position)
             else:
                 self._set(TAG.TAG_TANK_OUTPUT_VALVE_STATUS, 1)
-                logger.info(f"Tank output valve opened. Bottle level: {bottle_level:.2f}, Belt position: {belt_position:.2f}")
+                self._log.log(logging.INFO, "Tank output valve opened. Bottle level: %.2f, Belt position: %.2f",
+                              bottle_level, belt_position)
 
         
 
@@ -99,7 +105,7 @@ class PLC1(PLC):
         """
         try:
             # Read the drifted value directly using SensorConnector
-            drifted_level = self._sensor_connector.read(TAG.TAG_TANK_LEVEL_VALUE, apply_fault=True)
+            drifted_level = self._get(TAG.TAG_TANK_LEVEL_VALUE, apply_fault=True)
             self._set(TAG.TAG_TANK_LEVEL_VALUE, drifted_level)
             # Log the drifted value for debugging
             logger.warning(f"Sensor drift applied. Drifted tank level: {drifted_level:.2f}")
@@ -114,7 +120,7 @@ class PLC1(PLC):
         Simulates a tank leak by reducing the tank level.
         """
         leak_rate = random.uniform(0.01, 0.05)
-        current_level = self._sensor_connector.read(TAG.TAG_TANK_LEVEL_VALUE, apply_fault=True)
+        current_level = self._get(TAG.TAG_TANK_LEVEL_VALUE, apply_fault=True)
         new_level = max(0, current_level - leak_rate)
         self._set(TAG.TAG_TANK_LEVEL_VALUE, new_level)
         logger.warning(f"Tank Leak fault applied. Tank level reduced to: {new_level:.2f}")
@@ -124,7 +130,7 @@ class PLC1(PLC):
         Simulates overheating by introducing a delay in processing.
         """
         delay_time = random.uniform(1, 3)
-        time.sleep(delay_time)
+        self._clock.sleep(delay_time)
         logger.critical(f"Overheating fault applied. Processing delayed by {delay_time:.2f} seconds.")
 
     def _apply_valve_sticking(self):
@@ -152,7 +158,7 @@ class PLC1(PLC):
         # Log the alive time and loop latency for performance monitoring
         alive_time = self.get_alive_time() / 1000  # Convert to seconds
         loop_latency = self.get_loop_latency() / 1000  # Convert to seconds
-        logger.debug(f"Alive time: {alive_time:.2f} sec, Loop latency: {loop_latency:.4f} sec")
+        self._log.log(logging.DEBUG, "Alive time: %.2f sec, Loop latency: %.4f sec", alive_time, loop_latency)
 
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ import random
 import json
 
 from ics_sim.Device import PLC, SensorConnector, ActuatorConnector
+from ics_sim.reporter import RateLimitedReporter
 from Configs import TAG, Connection, Controllers
 
 
@@ -52,6 +53,9 @@ class PLC2(PLC):
         actuator_connector.add_actuator(TAG.TAG_BOTTLE_LEVEL_VALUE)  # Allow _set on TAG_BOTTLE_LEVEL_VALUE
 
         super().__init__(2, sensor_connector, actuator_connector, TAG.TAG_LIST, Controllers.PLCs)
+
+        # per-scan messages: repeats are collapsed, per-scan timing is sampled
+        self._log = RateLimitedReporter(logger.log, sample_every={logging.DEBUG: 10}, enabled=logger.isEnabledFor)
         self.faults = [
             self._apply_sensor_drift,
             self._apply_conveyor_belt_sticking,
@@ -64,10 +68,10 @@ class PLC2(PLC):
     def _logic(self):
         try:
             if self.simulation_mode == "faults":
-                logger.info("Executing system faults logic.")
+                self._log.log(logging.INFO, "Executing system faults logic.")
                 self._apply_next_fault()  # Continuously apply faults in a loop
             else:
-                logger.info("Executing normal operation logic.")
+                self._log.log(logging.INFO, "Executing normal operation logic.")
                 self._simulate_normal_operation()  # Perform normal operations
         except Exception as e:
             logger.error("Error in PLC2 logic: %s", str(e), exc_info=True)
@@ -76,7 +80,8 @@ class PLC2(PLC):
         try:
             # Start time for logic execution
             t1 = time.time()
-            logger.debug("Starting logic execution at: %s", time.strftime("%Y-%m-%d %H:%M:%S"))
+            if logger.isEnabledFor(logging.DEBUG):
+                self._log.log(logging.DEBUG, "Starting logic execution at: %s", time.strftime("%Y-%m-%d %H:%M:%S"))
 
             # Retrieve sensor and actuator data
             flow = self._get(TAG.TAG_TANK_OUTPUT_FLOW_VALUE)
@@ -86,10 +91,12 @@ class PLC2(PLC):
             # Normal operation logic
             if (belt_position > 1) or (flow == 0 and bottle_level > self._get(TAG.TAG_BOTTLE_LEVEL_MAX)):
                 self._set(TAG.TAG_CONVEYOR_BELT_ENGINE_STATUS, 1)
-                logger.info("Conveyor belt started. Belt position: %.2f, Bottle level: %.2f", belt_position, bottle_level)
+                self._log.log(logging.INFO, "Conveyor belt started. Belt position: %.2f, Bottle level: %.2f",
+                              belt_position, bottle_level)
             else:
                 self._set(TAG.TAG_CONVEYOR_BELT_ENGINE_STATUS, 0)
-                logger.info("Conveyor belt stopped. Belt position: %.2f, Bottle level: %.2f", belt_position, bottle_level)
+                self._log.log(logging.INFO, "Conveyor belt stopped. Belt position: %.2f, Bottle level: %.2f",
+                              belt_position, bottle_level)
 
             # Apply one fault at a time if in "faults" mode
             if self.simulation_mode == "faults":
@@ -98,7 +105,7 @@ class PLC2(PLC):
             # End time and execution duration
             t2 = time.time()
             execution_duration = t2 - t1
-            logger.debug("Logic execution duration: %.4f seconds", execution_duration)
+            self._log.log(logging.DEBUG, "Logic execution duration: %.4f seconds", execution_duration)
 
         except Exception as e:
             logger.error("Error in PLC2 logic: %s", str(e), exc_info=True)
@@ -122,7 +129,7 @@ class PLC2(PLC):
         """
         try:
             # Read the drifted value directly using SensorConnector
-            drifted_level = self._sensor_connector.read(TAG.TAG_BOTTLE_LEVEL_VALUE, apply_fault=True)
+            drifted_level = self._get(TAG.TAG_BOTTLE_LEVEL_VALUE, apply_fault=True)
             self._set(TAG.TAG_BOTTLE_LEVEL_VALUE, drifted_level)
             # Log the drifted value for debugging
             logger.warning(f"Sensor drift applied. Drifted bottle level: {drifted_level:.2f}")
@@ -144,7 +151,7 @@ class PLC2(PLC):
         logger.critical("Memory Corruption fault applied. Tank output flow set to %d", corrupted_value)
 
     def _apply_overheating(self):
-        time.sleep(2)  # Simulate processing delay
+        self._clock.sleep(2)  # Simulate processing delay
         logger.critical("Overheating fault applied. Processing delayed by 2 seconds.")
 
     def _get_simulation_mode(self):
@@ -0,0 +1,52 @@
+"""Throughput of the ModbusBase register codec in values per second.
+
+Run from the src folder:  python -m benchmarks.modbusCodecBenchmark [--values N] [--repeat R]
+"""
+import argparse
+import random
+import timeit
+
+from ics_sim.protocol import ModbusBase
+
+
+def per_value_encode(modbus_base, values):
+    words = []
+    for value in values:
+        words += modbus_base._encode_integer(int(value * modbus_base._precision_factor))
+    return words
+
+
+def per_value_decode(modbus_base, words):
+    step = modbus_base._word_num
+    return [modbus_base._decode_words(words[index:index + step]) for index in range(0, len(words), step)]
+
+
+def measure(function, count, repeat):
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    return count / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ModbusBase codec micro benchmark')
+    parser.add_argument('--values', type=int, default=10000, help='values per block')
+    parser.add_argument('--repeat', type=int, default=20, help='repetitions, the best one is reported')
+    args = parser.parse_args()
+
+    modbus_base = ModbusBase()
+    values = [random.uniform(0, 400000) for _ in range(args.values)]
+    words = modbus_base.encode_many(values)
+
+    results = [
+        ('encode per value', measure(lambda: per_value_encode(modbus_base, values), args.values, args.repeat)),
+        ('encode_many', measure(lambda: modbus_base.encode_many(values), args.values, args.repeat)),
+        ('decode per value', measure(lambda: per_value_decode(modbus_base, words), args.values, args.repeat)),
+        ('decode_many', measure(lambda: modbus_base.decode_many(words), args.values, args.repeat)),
+    ]
+
+    print('{:<20}{:>18}'.format('codec', 'values / second'))
+    for name, throughput in results:
+        print('{:<20}{:>18,.0f}'.format(name, throughput))
+
+
+if __name__ == '__main__':
+    main()
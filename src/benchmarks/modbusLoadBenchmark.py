@@ -0,0 +1,162 @@
+"""Load and latency of the Modbus protocol layer on localhost.
+
+Starts one server on an ephemeral loopback port and drives it with N client
+threads at a target request rate, mixing reads and writes by profile.
+Latency is measured from each request's scheduled send time, so a server that
+falls behind the rate is not hidden by the clients waiting for it.
+
+Run from the src folder:
+    python -m benchmarks.modbusLoadBenchmark [--clients N] [--rate R] [--duration S] [--profile P]
+        [--server-engine pymodbus|asyncio] [--client-engine pymodbus|asyncio] [--protocol P] [--json FILE]
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+
+from ics_sim.protocol import ProtocolFactory
+
+PROFILES = {
+    'read': 1.0,
+    'read-heavy': 0.9,
+    'balanced': 0.5,
+    'write-heavy': 0.1,
+    'write': 0.0,
+}
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoadClient(threading.Thread):
+    def __init__(self, index, args, port, start_at):
+        threading.Thread.__init__(self, name='load-client-{}'.format(index), daemon=True)
+        self.args = args
+        self.random = random.Random(args.seed + index)
+        self.interval = args.clients / args.rate if args.rate else 0
+        self.start_at = start_at + (self.interval * index / args.clients)
+        self.client = ProtocolFactory.create_client(args.protocol, '127.0.0.1', port,
+                                                    client_engine=args.client_engine)
+        self.latencies = {'read': [], 'write': []}
+        self.errors = {'read': 0, 'write': 0}
+
+    def run(self):
+        tag_ids = list(range(self.args.batch))
+        read_ratio = PROFILES[self.args.profile]
+        end_at = self.start_at + self.args.duration
+        scheduled = self.start_at
+        time.sleep(max(0.0, self.start_at - time.perf_counter()))
+        while scheduled < end_at:
+            if not self.interval:
+                scheduled = time.perf_counter()
+            elif scheduled > time.perf_counter():
+                time.sleep(scheduled - time.perf_counter())
+
+            operation = 'read' if self.random.random() < read_ratio else 'write'
+            try:
+                if operation == 'read':
+                    self.client.receive_many(tag_ids)
+                else:
+                    self.client.send_many({tag_id: self.random.uniform(0, 1000) for tag_id in tag_ids})
+                self.latencies[operation].append(time.perf_counter() - scheduled)
+            except Exception:
+                self.errors[operation] += 1
+            scheduled += self.interval
+        self.client.close()
+
+
+def summarize(operation, latencies, errors, duration):
+    ordered = sorted(latencies)
+    return {
+        'operation': operation,
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput': len(ordered) / duration,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def run(args):
+    port = free_port()
+    server = ProtocolFactory.create_server(args.protocol, '127.0.0.1', port, server_engine=args.server_engine)
+    server.start()
+    try:
+        start_at = time.perf_counter() + 0.2
+        clients = [LoadClient(index, args, port, start_at) for index in range(args.clients)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        duration = time.perf_counter() - start_at
+    finally:
+        server.stop()
+
+    rows = []
+    for operation in ('read', 'write'):
+        latencies = [latency for client in clients for latency in client.latencies[operation]]
+        errors = sum(client.errors[operation] for client in clients)
+        rows.append(summarize(operation, latencies, errors, duration))
+    rows.append(summarize('total', [latency for client in clients for operation in ('read', 'write')
+                                    for latency in client.latencies[operation]],
+                          sum(row['errors'] for row in rows), duration))
+
+    return {
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'duration_s': duration,
+        'results': rows,
+    }
+
+
+def print_table(report):
+    config = report['config']
+    print('{protocol} server={server_engine} client={client_engine} clients={clients} rate={rate}/s '
+          'profile={profile} batch={batch}'.format(**config))
+    print('{:<8}{:>10}{:>8}{:>12}{:>10}{:>10}{:>10}{:>10}'.format(
+        'op', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+    for row in report['results']:
+        print('{operation:<8}{requests:>10}{errors:>8}{throughput:>12,.0f}'
+              '{p50_ms:>10.3f}{p95_ms:>10.3f}{p99_ms:>10.3f}{max_ms:>10.3f}'.format(**row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Modbus protocol load benchmark')
+    parser.add_argument('--protocol', default=ProtocolFactory.PROTOCOL_MODBUS_TCP,
+                        choices=[ProtocolFactory.PROTOCOL_MODBUS_TCP, ProtocolFactory.PROTOCOL_LOOPBACK])
+    parser.add_argument('--server-engine', default=ProtocolFactory.ENGINE_PYMODBUS,
+                        choices=[ProtocolFactory.ENGINE_PYMODBUS, ProtocolFactory.ENGINE_ASYNCIO])
+    parser.add_argument('--client-engine', default=ProtocolFactory.ENGINE_PYMODBUS,
+                        choices=[ProtocolFactory.ENGINE_PYMODBUS, ProtocolFactory.ENGINE_ASYNCIO])
+    parser.add_argument('--clients', type=int, default=4, help='concurrent client threads')
+    parser.add_argument('--rate', type=float, default=1000, help='total requests per second, 0 runs unthrottled')
+    parser.add_argument('--duration', type=float, default=5, help='seconds of load')
+    parser.add_argument('--profile', default='read-heavy', choices=sorted(PROFILES), help='read/write mix')
+    parser.add_argument('--batch', type=int, default=1, help='tags per request')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the report as JSON to this file, - for stdout')
+    args = parser.parse_args()
+
+    report = run(args)
+    print_table(report)
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
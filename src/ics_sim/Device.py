@@ -8,8 +8,15 @@ from abc import ABC, abstractmethod
 from datetime import datetime
 
 from ics_sim.protocol import ProtocolFactory
-from ics_sim.configs import SpeedConfig
-from ics_sim.helper import current_milli_time, validate_type, current_milli_cycle_time
+from ics_sim.configs import SpeedConfig, PeerConfig
+from ics_sim.peers import PeerManager
+from ics_sim.processimage import ProcessImage
+from ics_sim.helper import current_milli_time, validate_type
+from ics_sim.clock import get_clock
+from ics_sim.scheduler import CycleScheduler
+from ics_sim.telemetry import CycleTelemetry
+from ics_sim import logqueue
+from ics_sim.reporter import RateLimitedReporter
 from ics_sim.connectors import ConnectorFactory
 
 from multiprocessing import Process
@@ -28,6 +35,33 @@ class Physics(ABC):
     def _get(self, tag):
         return self._connector.get(tag)
 
+    def _set_many(self, values):
+        return self._connector.set_many(values)
+
+    def _get_many(self, tags):
+        return self._connector.get_many(tags)
+
+    def _snapshot(self, tags):
+        return self._connector.snapshot(tags)
+
+    def _commit(self, values):
+        return self._connector.commit(values)
+
+    def get_versions(self, tags):
+        return self._connector.get_versions(tags)
+
+    def wait_for_change(self, tags, timeout=None, since=None):
+        return self._connector.wait_for_change(tags, timeout, since)
+
+    def subscribe(self, tags, callback):
+        return self._connector.subscribe(tags, callback)
+
+    def refresh(self):
+        self._connector.refresh()
+
+    def flush(self):
+        self._connector.flush()
+
 
 class SensorConnector(Physics):
     def __init__(self, connection):
@@ -52,11 +86,25 @@ class SensorConnector(Physics):
         if tag in self._sensors.keys():
             value = self._get(tag)  # Get the real value
             if apply_fault:  # Only apply fault if requested
-                value += random.uniform(value, -1 * value) * self._sensors[tag]
+                value = self.apply_fault(tag, value)
             return value
         else:
             raise LookupError()
-   
+
+    def read_many(self, tags, apply_fault=False):
+        for tag in tags:
+            if tag not in self._sensors.keys():
+                raise LookupError()
+
+        values = self._get_many(tags)
+        if apply_fault:
+            for tag, value in values.items():
+                values[tag] = self.apply_fault(tag, value)
+        return values
+
+    def apply_fault(self, tag, value):
+        """``value`` of sensor ``tag`` with the noise of the sensor's fault added."""
+        return value + random.uniform(value, -1 * value) * self._sensors[tag]
 
 
 
@@ -68,12 +116,21 @@ class ActuatorConnector(Physics):
     def add_actuator(self, tag):
         self._actuators.append(tag)
 
+    def is_actuator(self, tag):
+        return tag in self._actuators
+
     def write(self, tag, value):
         if tag in self._actuators:
             self._set(tag, value)
         else:
             raise LookupError()
 
+    def write_many(self, values):
+        for tag in values:
+            if tag not in self._actuators:
+                raise LookupError()
+        self._set_many(values)
+
 
 class Runnable(ABC):
     COLOR_RED = '\033[91m'
@@ -96,12 +153,18 @@ class Runnable(ABC):
         # self.__loop_process = Process(target=self.do_loop, args=())
         self.stop_event = threading.Event()
         self.__loop_process = threading.Thread(target=self.do_loop, args=(self.stop_event,))
+        # simulated time of this device, fixed at creation, see ics_sim.clock
+        self._clock = get_clock()
+        self._scheduler = CycleScheduler(loop, clock=self._clock)
+        self._telemetry = CycleTelemetry()
         self._last_loop_time = 0
         self._current_loop_time = 0
         self._start_time = 0
         self._last_logic_start = 0
         self._last_logic_end = 0
         self._initialize_logger()
+        # for messages raised every cycle while a condition holds, see RateLimitedReporter
+        self.reporter = RateLimitedReporter(lambda level, text: self.report(text, level), clock=self._clock.monotonic)
         self.__clear_scr = False
         self._std = sys.stdin.fileno()
 
@@ -133,8 +196,13 @@ class Runnable(ABC):
             os.makedirs(file_dir)
 
         file_path = os.path.join(file_dir,name) + file_ext
-        handler = logging.FileHandler(file_path, mode=write_mode)
-        handler.setFormatter(format_str)
+        pipeline = logqueue.get_pipeline()
+        if pipeline is None:
+            handler = logging.FileHandler(file_path, mode=write_mode)
+            handler.setFormatter(format_str)
+        else:
+            # only the text logs rotate, a recorder CSV has to stay one complete file
+            handler = pipeline.file_handler(file_path, format_str, write_mode, rotate=file_ext == '.log')
 
         # Let us Create an object
         logger = logging.getLogger(name)
@@ -142,6 +210,8 @@ class Runnable(ABC):
         # Now we are going to Set the threshold of logger to DEBUG
         logger.setLevel(level)
         logger.addHandler(handler)
+        if pipeline is not None:
+            pipeline.adopt(logger)
         return logger
 
     def name(self):
@@ -155,6 +225,7 @@ class Runnable(ABC):
         self.stop_event.set()
         #self.__loop_process.terminate()
         self._after_stop()
+        self.reporter.flush()
         self.report("stopped", logging.INFO)
 
     def _after_stop(self):
@@ -165,34 +236,69 @@ class Runnable(ABC):
 
     def do_loop(self, stop_event):
         try:
-            self.report("started", logging.INFO)
-            self._before_start()
-
-            self._start_time = self._current_loop_time = current_milli_cycle_time(self.__loop_cycle)
+            self.begin_loop()
             while not stop_event.is_set():
-
-                self._last_loop_time = self._current_loop_time
-                wait = self._last_loop_time + self.__loop_cycle - current_milli_time()
-
-                if wait > 0:
-                    time.sleep(wait / 1000)
-
-
-                self._current_loop_time = current_milli_cycle_time(self.__loop_cycle)
-                self._last_logic_start = current_milli_time()
-
-                self._pre_logic_update()
-                self._logic()
-                self._last_logic_end = current_milli_time()
-                self._post_logic_update()
+                self._scheduler.wait()
+                self.do_cycle()
         except Exception as e:
             self.report(e.__str__(), logging.fatal)
             raise e
 
+    def begin_loop(self):
+        """Prepare the device and anchor its cycle grid, the part of do_loop before the first cycle."""
+        self.report("started", logging.INFO)
+        self._before_start()
+        self._start_time = self._current_loop_time = self._scheduler.start()
 
-        except Exception as e:
-            self.report(e.__str__(), logging.fatal)
-            raise e
+    def do_cycle(self):
+        """Run one scan cycle, the caller is responsible for waiting until ``next_deadline_ns``.
+
+        Scheduling follows the device clock; the logic and cycle times in the
+        telemetry are real CPU time, whatever the clock.
+        """
+        cycle_start = time.perf_counter_ns()
+        self._last_loop_time = self._current_loop_time
+        self._current_loop_time = self._scheduler.begin_cycle()
+        self._last_logic_start = current_milli_time()
+
+        self._pre_logic_update()
+        logic_start = time.perf_counter_ns()
+        self._logic()
+        logic_end = time.perf_counter_ns()
+        self._last_logic_end = current_milli_time()
+        self._post_logic_update()
+
+        cycle_end = time.perf_counter_ns()
+        overruns = self._scheduler.overruns
+        self._scheduler.end_cycle()
+        self._telemetry.record(self._current_loop_time, self._scheduler.jitter_last_ns / 1e6,
+                               (logic_end - logic_start) / 1e6, (cycle_end - cycle_start) / 1e6,
+                               self._scheduler.overruns != overruns)
+
+    def next_deadline_ns(self):
+        return self._scheduler.deadline_ns
+
+    def is_stopped(self):
+        return self.stop_event.is_set()
+
+    def is_alive(self):
+        """Whether the loop thread of ``start`` is still running, False once it stopped or died."""
+        return self.__loop_process.is_alive()
+
+    def set_overrun_policy(self, policy):
+        """What to do when a cycle runs past the next deadline, see CycleScheduler. Safe on a running device."""
+        self._scheduler.set_policy(policy)
+
+    def get_scheduler_stats(self):
+        """Cycle count, overruns, missed deadlines and start jitter of the scan loop."""
+        return self._scheduler.get_stats()
+
+    def get_clock(self):
+        return self._clock
+
+    def get_telemetry(self):
+        """Ring buffer of the latest cycles: timestamp, latency, logic and cycle time, overrun flag."""
+        return self._telemetry
 
     def _before_start(self):
         sys.stdin = os.fdopen(self._std)
@@ -246,7 +352,16 @@ class Runnable(ABC):
     def __show_console(self, msg):
         timestamp = self._make_text( datetime.now().strftime("%H:%M:%S"), self.COLOR_PURPLE)
         name = self._make_text(self.name(), self.COLOR_CYAN)
-        print('[{} - {}]\t{}'.format(name, timestamp, msg), flush=True)
+        self._print('[{} - {}]\t{}'.format(name, timestamp, msg))
+
+    @staticmethod
+    def _print(text):
+        """Write a line to the console, through the logging pipeline when it is active."""
+        pipeline = logqueue.get_pipeline()
+        if pipeline is None:
+            print(text, flush=True)
+        else:
+            pipeline.console(text)
 
     @staticmethod
     def _make_text(msg, color):
@@ -258,31 +373,82 @@ class HIL(Runnable, Physics, ABC):
         Runnable.__init__(self, name, loop)
         Physics.__init__(self, connection)
 
+    def _pre_logic_update(self):
+        Runnable._pre_logic_update(self)
+        self.refresh()
+
+    def _post_logic_update(self):
+        Runnable._post_logic_update(self)
+        self.flush()
+
 
 class DcsComponent(Runnable):
+    # opt in to fail fast with last-known-good values while a peer is down; off, requests use the client's
+    # own timeout and every failure reaches the caller, which is what attack agents need
+    PEER_CIRCUIT_BREAKER = False
+
     def __init__(self, name, tags, plcs, loop):
         Runnable.__init__(self, name,  loop)
         self.plcs = plcs
         self.tags = tags
         self.clients = {}
+        self.peers = PeerManager()
         self.__init_clients()
 
     def __init_clients(self):
         for plc_id in self.plcs:
             plc = self.plcs[plc_id]
-            self.clients[plc_id] = (ProtocolFactory.create_client(plc['protocol'], plc['ip'], plc['port']))
+            options = self._protocol_options(plc)
+            if self.PEER_CIRCUIT_BREAKER:
+                options.setdefault('timeout', PeerConfig.TIMEOUT)
+            self.clients[plc_id] = (ProtocolFactory.create_client(plc['protocol'], plc['ip'], plc['port'], **options))
+            self.peers.add(plc_id, self.clients[plc_id],
+                           failure_threshold=plc.get('failure_threshold', PeerConfig.FAILURE_THRESHOLD),
+                           backoff_min=plc.get('backoff_min', PeerConfig.BACKOFF_MIN),
+                           backoff_max=plc.get('backoff_max', PeerConfig.BACKOFF_MAX),
+                           breaker=self.PEER_CIRCUIT_BREAKER)
+
+    @staticmethod
+    def _protocol_options(plc):
+        """Optional protocol settings of a PLC entry, everything except name/ip/port/protocol."""
+        return {key: value for key, value in plc.items() if key not in ('name', 'ip', 'port', 'protocol')}
+
+    def get_peer_stats(self):
+        """Health and latency of the connection to every peer PLC."""
+        return self.peers.get_stats()
+
+    def _after_stop(self):
+        self.peers.close()
 
     def _send(self, tag, value):
         tag_id = self.tags[tag]['id']
         plc_id = self.tags[tag]['plc']
-        self.clients[plc_id].send(tag_id, value)
+        self.peers[plc_id].send(tag_id, value)
 
     def _receive(self, tag):
 
         tag_id = self.tags[tag]['id']
         plc_id = self.tags[tag]['plc']
 
-        return self.clients[plc_id].receive(tag_id)
+        return self.peers[plc_id].receive(tag_id)
+
+    def _send_many(self, values):
+        for plc_id, tags in self.__group_by_plc(values.keys()).items():
+            self.peers[plc_id].send_many({self.tags[tag]['id']: values[tag] for tag in tags})
+
+    def _receive_many(self, tags):
+        values = {}
+        for plc_id, plc_tags in self.__group_by_plc(tags).items():
+            received = self.peers[plc_id].receive_many([self.tags[tag]['id'] for tag in plc_tags])
+            for tag in plc_tags:
+                values[tag] = received[self.tags[tag]['id']]
+        return values
+
+    def __group_by_plc(self, tags):
+        groups = {}
+        for tag in tags:
+            groups.setdefault(self.tags[tag]['plc'], []).append(tag)
+        return groups
 
     def _is_input_tag(self, tag):
         return self.tags[tag]['type'] == 'input'
@@ -298,6 +464,8 @@ class DcsComponent(Runnable):
 
 
 class PLC(DcsComponent):
+    PEER_CIRCUIT_BREAKER = True
+
     @abstractmethod
     def __init__(self,
                  plc_id,
@@ -320,31 +488,86 @@ class PLC(DcsComponent):
         self.__init_sensors()
         self.__init_actuators()
 
-        self.server = ProtocolFactory.create_server(self.protocol, self.ip, self.port)
+        self.server = ProtocolFactory.create_server(self.protocol, self.ip, self.port,
+                                                    **self._protocol_options(plcs[plc_id]))
         self.report('creating the server on IP = {}:{}'.format(self.ip, self.port), logging.INFO)
 
         self._snapshot_recorder = self.setup_logger("snapshots_" + self.name(), logging.Formatter('%(message)s'), file_ext=".csv")
         self.__record_variables = False;
 
+        self.__local_inputs = [tag for tag in self.tags if self._is_local_tag(tag) and self._is_input_tag(tag)]
+        self.__local_outputs = [tag for tag in self.tags if self._is_local_tag(tag) and self._is_output_tag(tag)]
+        self.__output_ids = [self._get_tag_id(tag) for tag in self.__local_outputs]
+        self.__output_values = {}
+        # local inputs and server-held outputs as of the start of the scan, the logic works on this
+        self._image = ProcessImage(self.__local_inputs + self.__local_outputs)
+
     def set_record_variables(self, value):
         self.__record_variables = value
 
 
+    def _pre_logic_update(self):
+        DcsComponent._pre_logic_update(self)
+        self._sensor_connector.refresh()
+        self._actuator_connector.refresh()
+        self._capture_image()
+
     def _post_logic_update(self):
         DcsComponent._post_logic_update(self)
         self._store_received_values()
         if self.__record_variables:
             self._record_variables()
+        self._actuator_connector.flush()
+        self._sensor_connector.flush()
 
-    def _store_received_values(self):
-        for tag_name, tag_data in self.tags.items():
-            if not self._is_local_tag(tag_name):
-                continue
+    def _capture_image(self):
+        """Read every local input and every output held by the server into the process image, one batch each.
 
-            if tag_data['type'] == 'output':
-                self._set(tag_name, self.server.get(tag_data['id']))
-            elif tag_data['type'] == 'input':
-                self.server.set(tag_data['id'], self._get(tag_name))
+        Tags a failed or short batch did not return keep their value from the
+        previous scan; that is reported and the scan goes on.
+        """
+        if self.__local_inputs:
+            self.__load_image('inputs', self.__local_inputs,
+                              lambda: self._sensor_connector.read_many(self.__local_inputs))
+        if self.__local_outputs:
+            def read_outputs():
+                registers = self.server.get_many(self.__output_ids)
+                return {tag: registers[self._get_tag_id(tag)] for tag in self.__local_outputs
+                        if self._get_tag_id(tag) in registers}
+            self.__load_image('outputs', self.__local_outputs, read_outputs)
+
+    def __load_image(self, kind, tags, read):
+        try:
+            values = read()
+        except Exception as e:
+            self.reporter.log(logging.WARNING, "Cannot read %s %s, keeping the last values. Error: %s", kind, tags, e,
+                              key='image-' + kind)
+            return
+        self._image.load(values)
+        if len(values) < len(tags):
+            missing = [tag for tag in tags if tag not in values]
+            self.reporter.log(logging.WARNING, "No value for %s %s, keeping the last values.", kind, missing,
+                              key='image-' + kind)
+
+    def _store_received_values(self):
+        written = self._image.take_dirty()
+
+        # physical process: inputs the logic overrode, and outputs whose value moved since they were
+        # last written, whether the logic or a client of the server changed them
+        physical = {tag: value for tag, value in written.items() if self._is_input_tag(tag)}
+        for tag in self.__local_outputs:
+            value = self._image.get(tag)
+            if tag not in self.__output_values or self.__output_values[tag] != value:
+                physical[tag] = value
+                self.__output_values[tag] = value
+        if physical:
+            self._actuator_connector.write_many(physical)
+
+        # server: the outputs the logic wrote, and every input so clients cannot override them
+        registers = {self._get_tag_id(tag): value for tag, value in written.items()}
+        registers.update({self._get_tag_id(tag): self._image.get(tag) for tag in self.__local_inputs})
+        if registers:
+            self.server.set_many(registers)
 
     def _record_variables(self, header=False):
         snapshot = ""
@@ -353,7 +576,7 @@ class PLC(DcsComponent):
             snapshot += "time, current_loop, loop_latency, logic_execution_time, "
         else:
             snapshot += "{}, {}, {}, {}, ".format(
-                datetime.now(),
+                datetime.fromtimestamp(self._clock.time()),
                 self._current_loop_time,
                 self.get_loop_latency(),
                 self.get_logic_execution_time()
@@ -417,23 +640,25 @@ class PLC(DcsComponent):
         LookupError: If the tag is not found or cannot be accessed.
         """
         if self._is_local_tag(tag):
-        # Input tags (e.g., sensors)
-            if self._is_input_tag(tag):
-                return self._sensor_connector.read(tag, apply_fault=apply_fault)
-        # Output tags (e.g., actuators or server-controlled values)
-            else:
-                return self.server.get(self._get_tag_id(tag))
+            # Input tags (sensors) and output tags (server-held values) come from the process image
+            value = self._image.get(tag)
+            if apply_fault and self._is_input_tag(tag):
+                return self._sensor_connector.apply_fault(tag, value)
+            return value
         else:
             try:
                 return self._receive(tag)
             except Exception as e:
-                self.report(f"Receive null value for tag: {tag}. Error: {e}", logging.WARNING)
+                self.reporter.log(logging.WARNING, "Receive null value for tag: %s. Error: %s", tag, e, key=tag)
                 return -1
 
     def _set(self, tag, value):
         if self._is_local_tag(tag):
-            self.server.set(self._get_tag_id(tag), value)
-            return self._actuator_connector.write(tag, value)
+            if not self._actuator_connector.is_actuator(tag):
+                raise LookupError()
+            # written to the server and the physical process at the end of the scan
+            self._image.set(tag, value)
+            return value
         else:
             self._send(tag, value)
 
@@ -443,9 +668,11 @@ class PLC(DcsComponent):
 
     def _before_start(self):
         self.server.start()
+        self._capture_image()
         for tag, value in self.tags.items():
             if self._is_output_tag(tag) and self._is_local_tag(tag):
                 self._set(tag, value['default'])
+        self._store_received_values()
         self._record_variables(True)
 
     def stop(self):
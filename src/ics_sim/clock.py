@@ -0,0 +1,113 @@
+import time
+from abc import ABC, abstractmethod
+
+# sleep overshoots by ~0.1 ms on Linux, so the last stretch before a deadline is spun
+SPIN_NS = 200000
+
+
+def sleep_until(deadline_ns):
+    """Sleep until ``perf_counter_ns()`` reaches ``deadline_ns``."""
+    remaining = deadline_ns - time.perf_counter_ns()
+    if remaining > SPIN_NS:
+        time.sleep((remaining - SPIN_NS) / 1e9)
+    while time.perf_counter_ns() < deadline_ns:
+        time.sleep(0)
+
+
+class Clock(ABC):
+    """Source of simulated time for devices, schedulers and physics.
+
+    ``time_ns`` is epoch time, ``monotonic_ns`` is the clock that cycle
+    deadlines are set on and ``sleep_until`` waits for a monotonic deadline.
+    """
+    @abstractmethod
+    def time_ns(self):
+        pass
+
+    @abstractmethod
+    def monotonic_ns(self):
+        pass
+
+    @abstractmethod
+    def sleep_until(self, deadline_ns):
+        pass
+
+    def time(self):
+        return self.time_ns() / 1e9
+
+    def monotonic(self):
+        return self.monotonic_ns() / 1e9
+
+    def sleep(self, seconds):
+        self.sleep_until(self.monotonic_ns() + int(seconds * 1e9))
+
+
+class WallClock(Clock):
+    """Real time, the default."""
+
+    def time_ns(self):
+        return time.time_ns()
+
+    def monotonic_ns(self):
+        return time.perf_counter_ns()
+
+    def sleep_until(self, deadline_ns):
+        sleep_until(deadline_ns)
+
+
+class ScaledClock(Clock):
+    """Real time running ``factor`` times faster, counted from when the clock is created.
+
+    ``perf_counter`` is system wide, so forked device processes share one
+    scaled time with the parent.
+    """
+    def __init__(self, factor):
+        if factor <= 0:
+            raise ValueError('Clock factor must be positive, not {}.'.format(factor))
+        self.factor = factor
+        self._origin_ns = time.perf_counter_ns()
+        self._epoch_ns = time.time_ns()
+
+    def time_ns(self):
+        return self._epoch_ns + self.monotonic_ns() - self._origin_ns
+
+    def monotonic_ns(self):
+        return self._origin_ns + int((time.perf_counter_ns() - self._origin_ns) * self.factor)
+
+    def sleep_until(self, deadline_ns):
+        sleep_until(self._origin_ns + int((deadline_ns - self._origin_ns) / self.factor))
+
+
+class VirtualClock(Clock):
+    """Discrete-event time: it stands still while code runs and sleeping jumps straight to the deadline.
+
+    Time only moves forward in ``sleep_until``, so it must be driven from one
+    thread, e.g. a CooperativeExecutor; devices on their own threads would
+    each push time ahead for all the others.
+    """
+    def __init__(self, epoch_ns=None):
+        self._epoch_ns = time.time_ns() if epoch_ns is None else epoch_ns
+        self._now_ns = 0
+
+    def time_ns(self):
+        return self._epoch_ns + self._now_ns
+
+    def monotonic_ns(self):
+        return self._now_ns
+
+    def sleep_until(self, deadline_ns):
+        if deadline_ns > self._now_ns:
+            self._now_ns = deadline_ns
+
+
+_clock = WallClock()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """Use ``clock`` for every device, scheduler and executor created from now on."""
+    global _clock
+    _clock = clock
@@ -22,3 +22,13 @@ class SpeedConfig:
     DEFAULT_FP_PERIOD_MS = PROCESS_PERIOD[SPEED_MODE]
 
 
+
+
+class PeerConfig:
+    # seconds a single request to a peer PLC may take
+    TIMEOUT = 0.5
+    # consecutive failures that open a peer's circuit
+    FAILURE_THRESHOLD = 2
+    # reconnect backoff bounds in seconds, doubled after every failed probe
+    BACKOFF_MIN = 0.5
+    BACKOFF_MAX = 30
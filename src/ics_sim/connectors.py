@@ -1,13 +1,20 @@
+import fcntl
+import mmap
 import os
 import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import uuid
 import memcache
 from abc import abstractmethod, ABC
 from os.path import splitext
 
 from pyModbusTCP.client import ModbusClient
 
+from ics_sim.clock import get_clock
 from ics_sim.helper import debug, error, validate_type
-import json
 
 from ics_sim.protocol import ClientModbus
 
@@ -20,6 +27,11 @@ class Connector(ABC):
         self._name = connection['name']
         self._path = connection['path']
         self._connection = connection
+        self._options = connection.get('options', {})
+        self._poll_interval = self._options.get('poll_interval', 10) / 1000
+        self._subscriptions = []
+        self._subscriptions_lock = threading.Lock()
+        self._watcher = None
 
     @abstractmethod
     def initialize(self, values, clear_old=False):
@@ -33,68 +45,326 @@ class Connector(ABC):
     def get(self, key):
         pass
 
+    def get_many(self, keys):
+        """Return a dict of key -> value; backends override it with a single round-trip."""
+        return {key: self.get(key) for key in keys}
+
+    def set_many(self, values):
+        """Write a dict of key -> value; backends override it with a single round-trip."""
+        for key, value in values.items():
+            self.set(key, value)
+        return values
+
+    def refresh(self):
+        """Called once at the start of a scan; only caching connectors act on it."""
+        pass
+
+    def flush(self):
+        """Called once at the end of a scan; only caching connectors act on it."""
+        pass
+
+    def snapshot(self, keys):
+        """Return (version, {key: value}) read at one consistent version of the store.
+
+        Backends without versioning return None as the version and read the keys
+        with ``get_many``, which is not guaranteed to be consistent.
+        """
+        return None, self.get_many(keys)
+
+    def commit(self, values):
+        """Write all values atomically and return the new store version (None if not versioned)."""
+        self.set_many(values)
+        return None
+
+    def get_versions(self, keys):
+        """Return key -> change token; a key's token differs once its value changed.
+
+        The default compares the values themselves; backends that keep version
+        counters override it with a cheaper lookup.
+        """
+        return self.get_many(keys)
+
+    def wait_for_change(self, keys, timeout=None, since=None):
+        """Block until one of the keys changes relative to the ``since`` versions.
+
+        Without ``since`` the versions at call time are used. Returns the list of
+        changed keys (empty on timeout) and the current versions, which can be
+        passed as ``since`` to the next call.
+        """
+        keys = list(keys)
+        versions = self.get_versions(keys) if since is None else since
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self.get_versions(keys)
+            changed = [key for key in keys if current.get(key) != versions.get(key)]
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed, current
+            time.sleep(self._poll_interval)
+
+    def subscribe(self, keys, callback):
+        """Call ``callback({key: value})`` with the changed keys whenever one of them changes.
+
+        Callbacks run on one watcher thread per connector, which polls the
+        versions every ``poll_interval`` ms (connection option, default 10).
+        """
+        keys = list(keys)
+        subscription = Subscription(keys, callback, self.get_versions(keys))
+        with self._subscriptions_lock:
+            self._subscriptions.append(subscription)
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self.__watch, daemon=True)
+                self._watcher.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._subscriptions_lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def __watch(self):
+        while True:
+            with self._subscriptions_lock:
+                subscriptions = list(self._subscriptions)
+                if not subscriptions:
+                    self._watcher = None
+                    return
+
+            keys = list(dict.fromkeys(key for subscription in subscriptions for key in subscription.keys))
+            versions = self.get_versions(keys)
+            for subscription in subscriptions:
+                changed = [key for key in subscription.keys if versions.get(key) != subscription.versions.get(key)]
+                if changed:
+                    subscription.versions = {key: versions.get(key) for key in subscription.keys}
+                    try:
+                        subscription.callback(self.get_many(changed))
+                    except Exception as e:
+                        error(f'subscription callback failed for tags {changed}: {e}')
+            time.sleep(self._poll_interval)
+
+
+class Subscription:
+    """Handle returned by ``Connector.subscribe``."""
+    def __init__(self, keys, callback, versions):
+        self.keys = keys
+        self.callback = callback
+        self.versions = versions
+
 
 class SQLiteConnector(Connector):
+    """SQLite backed connector.
+
+    By default every access opens its own connection (the historical behaviour).
+    With ``options={'pooled': True}`` each thread keeps one long-lived connection,
+    the database runs in WAL mode with relaxed fsync and the statements are reused
+    from the connection's statement cache.
+    """
     def __init__(self, connection):
         Connector.__init__(self, connection)
         self._key = 'name'
         self._value = 'value'
+        self._version = 'version'
+
+        self._pooled = self._options.get('pooled', False)
+        self._timeout = self._options.get('timeout', 5.0)
+        self._local = threading.local()
+        self._pool = []
+        self._pool_lock = threading.Lock()
+        self._generation = 0
+        self._opens = 0
+        self._commits = 0
+
+        # every write transaction bumps the table version in the meta table and
+        # stamps it on the rows whose value really changed
+        self._meta = '{}_meta'.format(self._name)
+        self._bump_query = 'UPDATE {0} SET {1} = {1} + 1'.format(self._meta, self._version)
+        self._set_query = 'UPDATE {0} SET {1} = ?, {2} = (SELECT {2} FROM {4}) WHERE {3} = ? AND {1} IS NOT ?'.format(
+            self._name,
+            self._value,
+            self._version,
+            self._key,
+            self._meta)
+        self._version_query = 'SELECT {} FROM {}'.format(self._version, self._meta)
+        self._get_query = 'SELECT {} FROM {} WHERE {} = ?'.format(self._value, self._name, self._key)
 
     def initialize(self, values, clear_old=True):
-        if clear_old and os.path.isfile(self._path):
-            os.remove(self._path)
+        if clear_old:
+            self.close()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.isfile(self._path + suffix):
+                    os.remove(self._path + suffix)
 
         schema = """
         CREATE TABLE {} (
             {}              TEXT NOT NULL,
             {}             REAL,
+            {}           INTEGER NOT NULL DEFAULT 0,
             PRIMARY KEY ({})
         );
-        """.format(self._name, self._key, self._value, self._key)
-        with sqlite3.connect(self._path) as conn:
-            conn.executescript(schema)
-
-        init_template = """
-                INSERT INTO {}""".format(self._name) + " VALUES ('{}',  {});"
+        CREATE TABLE {} (
+            {}           INTEGER NOT NULL
+        );
+        INSERT INTO {} VALUES (0);
+        """.format(self._name, self._key, self._value, self._version, self._key, self._meta, self._version, self._meta)
 
-        schema_init = ""
-        for item in values:
-            schema_init += init_template.format(*item)
+        init_query = 'INSERT INTO {} ({}, {}) VALUES (?, ?)'.format(self._name, self._key, self._value)
 
-        with sqlite3.connect(self._path) as conn:
-            conn.executescript(schema_init)
+        conn = self._acquire()
+        try:
+            conn.executescript(schema)
+            conn.executemany(init_query, values)
+            self._commit(conn)
+        finally:
+            self._release(conn)
 
     def set(self, key, value):
-        set_query = 'UPDATE {} SET {} = ? WHERE {} = ?'.format(
-            self._name,
-            self._value,
-            self._key)
-        with sqlite3.connect(self._path) as conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute(set_query, [value, key])
-                conn.commit()
-                return value
+        try:
+            self.__update({key: value})
+            return value
 
-            except sqlite3.Error as e:
-                error(f'_set in ICSSIM connection {e.args[0]} for setting tag {key}')
+        except sqlite3.Error as e:
+            error(f'_set in ICSSIM connection {e.args[0]} for setting tag {key}')
 
     def get(self, key):
-        get_query = """SELECT {} FROM {} WHERE {} = ?""".format(
+        conn = self._acquire()
+        try:
+            record = conn.execute(self._get_query, [key]).fetchone()
+            return record[0]
+
+        except sqlite3.Error as e:
+            error(f'_get in ICSSIM connection {e.args[0]} for getting tag {key}')
+        finally:
+            self._release(conn)
+
+    def get_many(self, keys):
+        return self.__select_many(self._value, keys)
+
+    def get_versions(self, keys):
+        return self.__select_many(self._version, keys)
+
+    def __select_many(self, column, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        select_query = 'SELECT {}, {} FROM {} WHERE {} IN ({})'.format(
+            self._key,
+            column,
+            self._name,
+            self._key,
+            ', '.join('?' * len(keys)))
+
+        conn = self._acquire()
+        try:
+            return dict(conn.execute(select_query, keys).fetchall())
+
+        except sqlite3.Error as e:
+            error(f'_get_many in ICSSIM connection {e.args[0]} for getting tags {keys}')
+            # callers look keys up in the result, an empty batch reads as "nothing came back"
+            return {}
+        finally:
+            self._release(conn)
+
+    def set_many(self, values):
+        if not values:
+            return values
+
+        try:
+            self.__update(values)
+            return values
+
+        except sqlite3.Error as e:
+            error(f'_set_many in ICSSIM connection {e.args[0]} for setting tags {list(values)}')
+
+    def snapshot(self, keys):
+        keys = list(keys)
+        snapshot_query = 'SELECT {}, {}, ({}) FROM {} WHERE {} IN ({})'.format(
+            self._key,
             self._value,
+            self._version_query,
             self._name,
-            self._key)
-
-        with sqlite3.connect(self._path) as conn:
-            try:
-
-                cursor = conn.cursor()
-                cursor.execute(get_query, [key])
-                record = cursor.fetchone()
-                return record[0]
-
-            except sqlite3.Error as e:
-                error(f'_get in ICSSIM connection {e.args[0]} for getting tag {key}')
+            self._key,
+            ', '.join('?' * len(keys)))
+
+        conn = self._acquire()
+        try:
+            # a single statement always reads one consistent state of the database
+            version = None
+            values = {}
+            for key, value, version in conn.execute(snapshot_query, keys):
+                values[key] = value
+            return version, values
+
+        except sqlite3.Error as e:
+            error(f'_snapshot in ICSSIM connection {e.args[0]} for getting tags {keys}')
+            return None, {}
+        finally:
+            self._release(conn)
+
+    def commit(self, values):
+        try:
+            return self.__update(values)
+
+        except sqlite3.Error as e:
+            error(f'_commit in ICSSIM connection {e.args[0]} for setting tags {list(values)}')
+
+    def __update(self, values):
+        conn = self._acquire()
+        try:
+            conn.execute(self._bump_query)
+            conn.executemany(self._set_query, [(value, key, value) for key, value in values.items()])
+            version = conn.execute(self._version_query).fetchone()[0]
+            self._commit(conn)
+            return version
+
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def get_stats(self):
+        """Return how many connections were opened and transactions committed so far."""
+        with self._pool_lock:
+            return {'opens': self._opens, 'commits': self._commits, 'pooled': self._pooled}
+
+    def close(self):
+        """Close every pooled connection; threads reopen lazily on their next access."""
+        with self._pool_lock:
+            self._generation += 1
+            for conn in self._pool:
+                conn.close()
+            self._pool.clear()
+
+    def _open(self):
+        conn = sqlite3.connect(self._path, timeout=self._timeout, check_same_thread=not self._pooled)
+        if self._pooled:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        # connections are opened and committed on every device thread
+        with self._pool_lock:
+            self._opens += 1
+        return conn
+
+    def _acquire(self):
+        if not self._pooled:
+            return self._open()
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.generation != self._generation:
+            conn = self._open()
+            with self._pool_lock:
+                self._pool.append(conn)
+                self._local.generation = self._generation
+            self._local.conn = conn
+        return conn
+
+    def _release(self, conn):
+        if not self._pooled:
+            conn.close()
+
+    def _commit(self, conn):
+        conn.commit()
+        with self._pool_lock:
+            self._commits += 1
 
 
 class MemcacheConnector(Connector):
@@ -103,21 +373,43 @@ class MemcacheConnector(Connector):
         self._key = 'name'
         self._value = 'value'
         self.memcached_client = memcache.Client([self._path], debug=0)
+        # every write stores a new unique token under '<key>:version'
+        self._version_prefix = uuid.uuid4().hex
+        self._version_counter = 0
 
 
     def initialize(self, values, clear_old=False):
         if clear_old:
             os.system('/etc/init.d/memcached restart')
 
-        for key, value in values:
-            self.memcached_client.set(key, value)
+        self.set_many(dict(values))
 
     def set(self, key, value):
-        self.memcached_client.set(key, value)
+        self.set_many({key: value})
 
     def get(self, key):
         return self.memcached_client.get(key)
 
+    def get_many(self, keys):
+        return self.memcached_client.get_multi(list(keys))
+
+    def set_many(self, values):
+        self._version_counter += 1
+        version = '{}:{}'.format(self._version_prefix, self._version_counter)
+        mapping = dict(values)
+        mapping.update({self.__version_key(key): version for key in values})
+        self.memcached_client.set_multi(mapping)
+        return values
+
+    def get_versions(self, keys):
+        keys = list(keys)
+        versions = self.memcached_client.get_multi([self.__version_key(key) for key in keys])
+        return {key: versions.get(self.__version_key(key)) for key in keys}
+
+    @staticmethod
+    def __version_key(key):
+        return '{}:version'.format(key)
+
     def __del__(self):
         self.memcached_client.disconnect_all()
 
@@ -137,44 +429,419 @@ class HardwareConnector(Connector, ABC):
         self.__clientModbus.send(key, value)
 
 
-class FileConnector(Connector):
+class TagTableConnector(Connector, ABC):
+    """Fixed-layout table of float64 slots in a memory-mapped file.
+
+    Layout (native byte order)::
+
+        header  magic (8s) | slot count (Q) | sequence (Q)
+        names   slot count * NAME_SIZE bytes, utf-8, zero padded
+        slots   slot count * (value (d) | version (Q))
+
+    Writers are serialized by a thread lock plus an flock on ``<file>.lock`` and
+    move the sequence to an odd value while they write and to the next even value
+    when done. Every written slot stores that even value as its version. Readers
+    never lock; they retry until they see the same even sequence before and after
+    copying the values (seqlock), so a read is never torn. A reader that waits
+    for a writer longer than ``READ_TIMEOUT`` seconds raises TimeoutError.
+    """
+    MAGIC = b'ICSTAGS1'
+    NAME_SIZE = 64
+    HEADER = struct.Struct('=8sQQ')
+    SEQUENCE = struct.Struct('=Q')
+    SEQUENCE_OFFSET = 16
+    SLOT = struct.Struct('=dQ')
+    VALUE = struct.Struct('=d')
+    VERSION = struct.Struct('=Q')
+    VERSION_OFFSET = 8
+    # reader retries before it starts yielding the CPU, and seconds it waits for a writer at most
+    READ_SPINS = 100
+    READ_TIMEOUT = 1.0
+
     def __init__(self, connection):
         Connector.__init__(self, connection)
+        self._buffer = None
+        self._offsets = {}
+        self._lock = None
+
+    @abstractmethod
+    def _file_path(self):
+        pass
 
     def initialize(self, values, clear_old=True):
-        if not os.path.isfile(self._path):
-            f = open(self._path, "x")
-            obj = json.dumps(values)
-            f.write(obj)
-            f.close()
+        values = list(values)
+        names = [key for key, value in values]
+
+        with self._write_lock():
+            buffer = self._buffer if self._buffer is not None else self._try_attach()
+            if buffer is None or self.__names(buffer) != names:
+                if buffer is not None and not clear_old:
+                    raise ValueError('%s already holds a different tag layout.' % self._file_path())
+                self.close()
+                self.__create(names)
+            self.__store(values)
+        self._after_store()
+
+    def set(self, key, value):
+        self._table()
+        with self._write_lock():
+            self.__store(((key, value),))
+        self._after_store()
+        return value
+
+    def get(self, key):
+        buffer = self._table()
+        offset = self._offsets[key]
+        return self.__consistent(buffer, lambda: self.VALUE.unpack_from(buffer, offset)[0])[1]
+
+    def get_many(self, keys):
+        return self._read(keys)[1]
+
+    def get_versions(self, keys):
+        buffer = self._table()
+        offsets = [(key, self._offsets[key] + self.VERSION_OFFSET) for key in keys]
+        return self.__consistent(
+            buffer, lambda: {key: self.VERSION.unpack_from(buffer, offset)[0] for key, offset in offsets})[1]
+
+    def set_many(self, values):
+        self.commit(values)
+        return values
+
+    def snapshot(self, keys):
+        return self._read(keys)
+
+    def commit(self, values):
+        self._table()
+        with self._write_lock():
+            sequence = self.__store(values.items())
+        self._after_store()
+        return sequence
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+    def _after_store(self):
+        pass
+
+    def _table(self):
+        buffer = self._buffer
+        if buffer is None:
+            buffer = self._try_attach()
+            if buffer is None:
+                raise FileNotFoundError('%s is not initialized yet.' % self._file_path())
+        return buffer
+
+    def _read(self, keys):
+        """Return (sequence, {key: value}) copied at one consistent sequence."""
+        buffer = self._table()
+        offsets = [(key, self._offsets[key]) for key in keys]
+        return self.__consistent(buffer, lambda: {key: self.VALUE.unpack_from(buffer, offset)[0]
+                                                  for key, offset in offsets})
+
+    def _write_lock(self):
+        if self._lock is None:
+            self._lock = _TagTableLock(self._file_path() + '.lock')
+        return self._lock
+
+    def _try_attach(self):
+        try:
+            fd = os.open(self._file_path(), os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        try:
+            buffer = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+
+        magic, count, sequence = self.HEADER.unpack_from(buffer, 0)
+        if magic != self.MAGIC:
+            buffer.close()
+            raise ValueError('%s is not an ICSSIM tag table.' % self._file_path())
+        self.__map(buffer, self.__names(buffer))
+        return buffer
+
+    def __create(self, names):
+        size = self.HEADER.size + len(names) * (self.NAME_SIZE + self.SLOT.size)
+        temp_path = '{}.{}.tmp'.format(self._file_path(), os.getpid())
+        fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            os.ftruncate(fd, size)
+            buffer = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        self.HEADER.pack_into(buffer, 0, self.MAGIC, len(names), 0)
+        for index, name in enumerate(names):
+            encoded = name.encode()
+            if len(encoded) > self.NAME_SIZE:
+                raise ValueError('%s is longer than %d bytes.' % (name, self.NAME_SIZE))
+            start = self.HEADER.size + index * self.NAME_SIZE
+            buffer[start:start + len(encoded)] = encoded
+
+        # readers attach by path, so they only ever see a fully formatted table
+        os.replace(temp_path, self._file_path())
+        self.__map(buffer, names)
+
+    def __map(self, buffer, names):
+        slots_start = self.HEADER.size + len(names) * self.NAME_SIZE
+        self._offsets = {name: slots_start + index * self.SLOT.size for index, name in enumerate(names)}
+        self._buffer = buffer
+
+    def __names(self, buffer):
+        count = self.HEADER.unpack_from(buffer, 0)[1]
+        names = []
+        for index in range(count):
+            start = self.HEADER.size + index * self.NAME_SIZE
+            names.append(bytes(buffer[start:start + self.NAME_SIZE]).rstrip(b'\0').decode())
+        return names
+
+    def __consistent(self, buffer, read):
+        """Return (sequence, read()) from a moment no writer was active, see the class docstring."""
+        spins = 0
+        deadline = None
+        while True:
+            sequence = self.SEQUENCE.unpack_from(buffer, self.SEQUENCE_OFFSET)[0]
+            if not sequence & 1:
+                result = read()
+                if sequence == self.SEQUENCE.unpack_from(buffer, self.SEQUENCE_OFFSET)[0]:
+                    return sequence, result
+
+            spins += 1
+            if spins < self.READ_SPINS:
+                continue
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + self.READ_TIMEOUT
+            elif now >= deadline:
+                raise TimeoutError('%s: a write did not finish within %s seconds.' % (self._file_path(),
+                                                                                      self.READ_TIMEOUT))
+            time.sleep(0)
+
+    def __store(self, items):
+        buffer = self._buffer
+        # resolve and pack everything first, a bad key or value must not leave the sequence odd
+        slots = [(self._offsets[key], self.VALUE.pack(value)) for key, value in items]
+
+        sequence = self.SEQUENCE.unpack_from(buffer, self.SEQUENCE_OFFSET)[0]
+        self.SEQUENCE.pack_into(buffer, self.SEQUENCE_OFFSET, sequence + 1)
+        try:
+            version = self.VERSION.pack(sequence + 2)
+            for offset, value in slots:
+                if buffer[offset:offset + self.VALUE.size] != value:
+                    buffer[offset:offset + self.SLOT.size] = value + version
+        finally:
+            self.SEQUENCE.pack_into(buffer, self.SEQUENCE_OFFSET, sequence + 2)
+        return sequence + 2
+
+    def __del__(self):
+        self.close()
+
+
+class _TagTableLock:
+    """Exclusive lock across the threads of this process and across processes."""
+    def __init__(self, path):
+        self._thread_lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def __del__(self):
+        os.close(self._fd)
+
+
+class SharedMemoryConnector(TagTableConnector):
+    """Tag table in shared memory (``/dev/shm``) for devices on the same host.
+
+    ``path`` is the name of the shared segment. The HIL creates it through
+    ``initialize``; every other device attaches on its first access.
+    """
+    SHM_DIR = '/dev/shm'
+
+    def _file_path(self):
+        folder = self.SHM_DIR if os.path.isdir(self.SHM_DIR) else tempfile.gettempdir()
+        return os.path.join(folder, self._path)
+
+    def unlink(self):
+        self.close()
+        for path in (self._file_path(), self._file_path() + '.lock'):
+            if os.path.isfile(path):
+                os.remove(path)
+
+
+class FileConnector(TagTableConnector):
+    """Tag table in a regular memory-mapped file.
+
+    Reads and writes touch the tag's slot in place. With
+    ``options={'sync_interval': ms}`` dirty pages are written back with msync at
+    most once per interval; otherwise the kernel writes them back on its own.
+    """
+    def __init__(self, connection):
+        TagTableConnector.__init__(self, connection)
+        self._sync_interval = self._options.get('sync_interval')
+        self._last_sync = 0
+
+    def _file_path(self):
+        return self._path
+
+    def sync(self):
+        if self._buffer is not None:
+            self._buffer.flush()
+        self._last_sync = time.monotonic()
+
+    def _after_store(self):
+        if self._sync_interval is not None and (time.monotonic() - self._last_sync) * 1000 >= self._sync_interval:
+            self.sync()
+
+
+class CachedConnector(Connector):
+    """Write-behind cache in front of another connector.
+
+    Reads are served from a local dict, which ``refresh`` re-reads in one batch
+    once ``coherence_interval`` ms of simulated time have passed. Writes only
+    update the dict and mark the tag dirty; ``flush`` writes every dirty tag in
+    one batch. A cache belongs to one device and is not shared between threads.
+    """
+    def __init__(self, connector, coherence_interval=0):
+        Connector.__init__(self, connector._connection)
+        self._connector = connector
+        self._coherence_interval = coherence_interval
+        self._values = {}
+        self._dirty = {}
+        self._versions = {}
+        self._clock = get_clock()
+        self._last_refresh = self._clock.monotonic()
+        self._hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._flushes = 0
+
+    def initialize(self, values, clear_old=None):
+        self._values.clear()
+        self._dirty.clear()
+        # without clear_old the wrapped connector applies its own default
+        if clear_old is None:
+            return self._connector.initialize(values)
+        return self._connector.initialize(values, clear_old)
 
     def set(self, key, value):
-        f = open(self._path, 'w')
-        data = json.load(f)
-        data[key] = value
-        obj = json.dumps(data)
-        f.write(obj)
-        f.close()
+        self._values[key] = value
+        self._dirty[key] = value
+        return value
 
     def get(self, key):
-        f = open(self._path)
-        data = json.load(f)
-        f.close()
-        return data[key]
+        if key in self._values:
+            self._hits += 1
+            return self._values[key]
+
+        self._misses += 1
+        value = self._connector.get(key)
+        self._values[key] = value
+        return value
+
+    def get_many(self, keys):
+        result = {}
+        missing = []
+        for key in keys:
+            if key in self._values:
+                result[key] = self._values[key]
+            else:
+                missing.append(key)
+
+        self._hits += len(result)
+        if missing:
+            self._misses += len(missing)
+            fetched = self._connector.get_many(missing)
+            self._values.update(fetched)
+            result.update(fetched)
+        return result
+
+    def set_many(self, values):
+        self._values.update(values)
+        self._dirty.update(values)
+        return values
+
+    def refresh(self, force=False):
+        now = self._clock.monotonic()
+        if not force and (now - self._last_refresh) * 1000 < self._coherence_interval:
+            return
+
+        self._last_refresh = now
+        clean = [key for key in self._values if key not in self._dirty]
+        if clean:
+            self._values.update(self._connector.get_many(clean))
+            self._refreshes += 1
+
+    def flush(self):
+        if self._dirty:
+            self._connector.set_many(self._dirty)
+            self._dirty = {}
+            self._flushes += 1
+
+    def snapshot(self, keys):
+        version, values = self._connector.snapshot(keys)
+        for key, value in values.items():
+            if key not in self._dirty:
+                self._values[key] = value
+        return version, values
+
+    def commit(self, values):
+        for key in values:
+            self._dirty.pop(key, None)
+        self._values.update(values)
+        return self._connector.commit(values)
+
+    def get_versions(self, keys):
+        versions = self._connector.get_versions(keys)
+        # a moved version makes the cached value stale
+        for key, version in versions.items():
+            if self._versions.get(key, version) != version and key not in self._dirty:
+                self._values.pop(key, None)
+        self._versions.update(versions)
+        return versions
+
+    def get_stats(self):
+        total = self._hits + self._misses
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_ratio': self._hits / total if total else 0,
+            'refreshes': self._refreshes,
+            'flushes': self._flushes,
+            'dirty': len(self._dirty),
+        }
 
 
 class ConnectorFactory:
     @staticmethod
     def build(connection):
+        connector = ConnectorFactory.__build(connection)
+
+        options = connection.get('options', {})
+        if options.get('cache', False):
+            connector = CachedConnector(connector, options.get('coherence_interval', 0))
+        return connector
+
+    @staticmethod
+    def __build(connection):
         validate_type(connection, 'connection', dict)
 
         connection_keys = connection.keys()
-        if (not connection_keys) or (len(connection_keys) != 3):
-            raise KeyError('Connection must contain 3 keys.')
-        else:
-            for key in connection_keys:
-                if (key != 'path') and (key != 'name') and (key != 'type'):
-                    raise KeyError('%s is an invalid key.' % key)
+        for key in ('path', 'name', 'type'):
+            if key not in connection_keys:
+                raise KeyError('Connection must contain %s key.' % key)
+        for key in connection_keys:
+            if (key != 'path') and (key != 'name') and (key != 'type') and (key != 'options'):
+                raise KeyError('%s is an invalid key.' % key)
+        if 'options' in connection_keys:
+            validate_type(connection['options'], 'connection options', dict)
 
         if connection['type'] == 'sqlite':
             sub_path, extension = splitext(connection['path'])
@@ -192,6 +859,9 @@ class ConnectorFactory:
         elif connection['type'] == 'memcache':
             return MemcacheConnector(connection)
 
+        elif connection['type'] == 'shm':
+            return SharedMemoryConnector(connection)
+
         else:
             raise ValueError('Connection type is not supported')
 
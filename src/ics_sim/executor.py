@@ -0,0 +1,68 @@
+import heapq
+import logging
+import threading
+
+from ics_sim.clock import get_clock
+
+
+class CooperativeExecutor:
+    """Runs many Runnables from a single thread instead of one thread per device.
+
+    Devices sit in a heap ordered by their next deadline; the executor sleeps
+    until the earliest one, runs that device's cycle and pushes it back with
+    its new deadline. Devices due at the same time run in the order they were
+    added, so a run is repeatable. Each device keeps its own period and overrun
+    policy. A ``_logic`` that blocks (e.g. the overheating fault sleeps) delays
+    every device behind it. On a VirtualClock nothing sleeps: time jumps
+    from deadline to deadline and the devices run as fast as the CPU allows.
+    """
+    def __init__(self, name='executor', clock=None):
+        self.name = name
+        self.clock = get_clock() if clock is None else clock
+        self.stop_event = threading.Event()
+        self._runnables = []
+        self._heap = []
+        self._thread = None
+
+    def add(self, runnable):
+        self._runnables.append(runnable)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=self.name)
+        self._thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for runnable in self._runnables:
+            if not runnable.is_stopped():
+                runnable.stop()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def run(self):
+        self._begin()
+        while self._heap and not self.stop_event.is_set():
+            self.clock.sleep_until(self._heap[0][0])
+            if self.stop_event.is_set():
+                break
+            self._run_next()
+
+    def _begin(self):
+        for order, runnable in enumerate(self._runnables):
+            runnable.begin_loop()
+            heapq.heappush(self._heap, (runnable.next_deadline_ns(), order, runnable))
+
+    def _run_next(self):
+        """Run the cycle of the device with the earliest deadline, which must be due."""
+        deadline, order, runnable = heapq.heappop(self._heap)
+        if runnable.is_stopped():
+            return
+        try:
+            runnable.do_cycle()
+        except Exception as e:
+            runnable.report(e.__str__(), logging.FATAL)
+            return
+        heapq.heappush(self._heap, (runnable.next_deadline_ns(), order, runnable))
+
+    def get_stats(self):
+        return {runnable.name(): runnable.get_scheduler_stats() for runnable in self._runnables}
@@ -1,4 +1,4 @@
-import time
+from ics_sim.clock import get_clock
 
 
 def validate_type(variable: str, variable_name: str, variable_type: type):
@@ -9,11 +9,11 @@ def validate_type(variable: str, variable_name: str, variable_type: type):
 
 
 def current_milli_time():
-    return round(time.time() * 1000)
+    return round(get_clock().time() * 1000)
 
 
 def current_milli_cycle_time(cycle):
-    return round(time.time() * 1000 / cycle) * cycle
+    return round(get_clock().time() * 1000 / cycle) * cycle
 
 
 def debug(msg):
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+
+
+def _run_device(factory, index, cpu, telemetry, interval):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+
+    # constructed here, so the device's threads, sockets and connectors belong to this process
+    device = factory()
+    device.start()
+    while not stop_event.wait(interval):
+        telemetry.publish(index, device)
+        if not device.is_alive():
+            # the loop thread died, report it through the exit code instead of publishing stale telemetry
+            device.stop()
+            sys.exit(1)
+    device.stop()
+    telemetry.publish(index, device)
+
+
+class Telemetry:
+    """Scan cycle statistics of every device process, kept in one shared memory array.
+
+    Each process writes only its own row, under the array lock, so a reader
+    never sees a half written row.
+    """
+    FIELDS = ('pid', 'updated', 'cycles', 'overruns', 'missed_deadlines',
+              'jitter_last_ms', 'jitter_avg_ms', 'jitter_max_ms', 'logic_ms')
+
+    def __init__(self, count):
+        self.values = multiprocessing.Array('d', count * len(self.FIELDS))
+
+    def publish(self, index, device):
+        stats = device.get_scheduler_stats()
+        row = [os.getpid(), time.time()] + [stats[field] for field in self.FIELDS[2:-1]] + \
+              [device.get_logic_execution_time()]
+        start = index * len(self.FIELDS)
+        with self.values.get_lock():
+            self.values[start:start + len(self.FIELDS)] = row
+
+    def read(self, index):
+        start = index * len(self.FIELDS)
+        with self.values.get_lock():
+            row = self.values[start:start + len(self.FIELDS)]
+        return dict(zip(self.FIELDS, row))
+
+
+class ProcessLauncher:
+    """Starts every device in its own process, optionally pinned to a CPU.
+
+    Devices are given as factories (usually the device class) and constructed
+    in the child. SIGINT and SIGTERM received by the launcher are forwarded to
+    the children, which stop their device cleanly. Children publish their scan
+    cycle statistics every ``telemetry_interval`` seconds to shared memory,
+    see ``get_telemetry``.
+    """
+    def __init__(self, telemetry_interval=1.0, stop_timeout=5.0):
+        self.telemetry_interval = telemetry_interval
+        self.stop_timeout = stop_timeout
+        self._devices = []
+        self._processes = []
+        self._telemetry = None
+
+    def add(self, name, factory, cpu=None):
+        self._devices.append((name, factory, cpu))
+
+    @staticmethod
+    def available_cpus():
+        if hasattr(os, 'sched_getaffinity'):
+            return sorted(os.sched_getaffinity(0))
+        return list(range(os.cpu_count() or 1))
+
+    def start(self):
+        self._telemetry = Telemetry(len(self._devices))
+        for index, (name, factory, cpu) in enumerate(self._devices):
+            process = multiprocessing.Process(target=_run_device, name=name,
+                                              args=(factory, index, cpu, self._telemetry, self.telemetry_interval))
+            process.start()
+            self._processes.append(process)
+
+    def forward_signals(self):
+        """Install SIGINT/SIGTERM handlers in this process that stop all devices."""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda received, frame: self.stop())
+
+    def wait(self):
+        """Wait until every device process ended. Returns the exit code of each, non-zero when a device died."""
+        for process in self._processes:
+            while process.is_alive():
+                process.join(0.5)
+        return {process.name: process.exitcode for process in self._processes}
+
+    def stop(self):
+        for process in self._processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        deadline = time.time() + self.stop_timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                process.terminate()
+
+    def get_telemetry(self):
+        return {name: self._telemetry.read(index) for index, (name, factory, cpu) in enumerate(self._devices)}
@@ -0,0 +1,69 @@
+import random
+
+from ics_sim.Device import HIL
+from ics_sim.clock import VirtualClock, get_clock, set_clock
+from ics_sim.executor import CooperativeExecutor
+
+# 2024-01-01 00:00:00 UTC; a fixed start keeps timestamps and the cycle grid the same between runs
+EPOCH_NS = 1704067200 * 1000000000
+
+
+class LockstepSimulation(CooperativeExecutor):
+    """Co-simulation that steps the HIL and the PLCs one after the other on virtual time.
+
+    Creating it installs its VirtualClock as the process clock and seeds
+    ``random``, so it has to be created before the devices; ``stop`` puts the
+    previous clock and random state back. Each ``step`` jumps to the next
+    deadline and runs every device due then, HILs first and the other devices
+    in the order they were added, so the controllers always see the plant
+    state of the same step. Nothing sleeps and nothing runs on
+    another thread: given the same seed and devices a run produces the same
+    trace on any machine, as fast as the logic executes.
+    """
+    def __init__(self, seed=0, epoch_ns=EPOCH_NS, name='lockstep'):
+        CooperativeExecutor.__init__(self, name, VirtualClock(epoch_ns))
+        self.seed = seed
+        self._previous_clock = get_clock()
+        self._previous_random_state = random.getstate()
+        self._begun = False
+        set_clock(self.clock)
+        random.seed(seed)
+
+    def add(self, runnable):
+        if runnable.get_clock() is not self.clock:
+            raise ValueError('{} was created before the lockstep simulation.'.format(runnable.name()))
+        CooperativeExecutor.add(self, runnable)
+
+    def step(self):
+        """Run one step. Returns the virtual time in seconds, which stays put once no device is left to run."""
+        if not self._begun:
+            self._begin()
+        if not self._heap:
+            return self.clock.monotonic()
+        deadline = self._heap[0][0]
+        self.clock.sleep_until(deadline)
+        while self._heap and self._heap[0][0] <= deadline:
+            self._run_next()
+        return self.clock.monotonic()
+
+    def run(self, duration=None):
+        """Step until ``duration`` seconds of virtual time have passed, or until stopped."""
+        if not self._begun:
+            self._begin()
+        end = None if duration is None else self.clock.monotonic_ns() + int(duration * 1e9)
+        while self._heap and not self.stop_event.is_set():
+            if end is not None and self._heap[0][0] > end:
+                break
+            self.step()
+
+    def stop(self):
+        CooperativeExecutor.stop(self)
+        if get_clock() is self.clock:
+            set_clock(self._previous_clock)
+            random.setstate(self._previous_random_state)
+
+    def _begin(self):
+        # the plant moves first, then the controllers read it
+        self._runnables.sort(key=lambda runnable: not isinstance(runnable, HIL))
+        self._begun = True
+        CooperativeExecutor._begin(self)
@@ -0,0 +1,215 @@
+import atexit
+import copy
+import logging
+import os
+import sys
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+
+class RouteHandler(QueueHandler):
+    """Puts records on the pipeline queue without blocking; records that do not fit are dropped and counted."""
+
+    def __init__(self, pipeline, route):
+        QueueHandler.__init__(self, pipeline)
+        self.pipeline = pipeline
+        self.route = route
+
+    def prepare(self, record):
+        # a copy, the same record propagates on to the route handlers of ancestor loggers;
+        # only the %-merge happens on the caller's thread, the formatters run on the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.route = self.route
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.put(record, record.levelname)
+
+
+class LogPipeline:
+    """Background logging pipeline: callers enqueue, one listener thread formats and writes.
+
+    Loggers are attached with ``adopt``: their handlers move to the listener
+    thread and are replaced by a RouteHandler, so a scan thread never waits on
+    a file, the terminal or a syslog socket. Enqueuing is a deque append, the
+    listener wakes every ``flush_interval`` seconds and writes everything
+    queued as one batch, flushing each handler once and writing all console
+    lines at once. The queue is bounded; when ``max_queue`` entries are waiting
+    new entries are dropped and counted per level.
+    """
+    def __init__(self, max_queue=10000, flush_interval=0.05, max_bytes=5 * 1024 * 1024, backup_count=3):
+        self.queue = deque()
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._routes = {}
+        self._adopted = {}
+        self._console = []
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.overflows = 0
+        self.dropped = {}
+        self.max_depth = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self.__listen, name='log-pipeline', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def restart_after_fork(self):
+        """A forked child inherits the queue but not the listener thread, give it an empty queue and a listener."""
+        self.queue = deque()
+        self._console = []
+        self._stop_event = threading.Event()
+        self.start()
+
+    def stop(self):
+        """Write everything still queued and stop the listener."""
+        if self._thread is None or self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        self._thread.join(5)
+        self._thread = None
+
+    def adopt(self, logger):
+        """Move the handlers of ``logger`` to the listener thread."""
+        handlers = [handler for handler in logger.handlers if not isinstance(handler, RouteHandler)]
+        if not handlers:
+            return
+        for handler in handlers:
+            logger.removeHandler(handler)
+
+        routed = [handler for handler in logger.handlers
+                  if isinstance(handler, RouteHandler) and handler.pipeline is self]
+        if routed:
+            self._routes[routed[0].route].extend(handlers)
+        else:
+            route = len(self._routes)
+            self._routes[route] = handlers
+            self._adopted[route] = logger
+            logger.addHandler(RouteHandler(self, route))
+
+    def release(self):
+        """Give every adopted logger its handlers back."""
+        for route, logger in self._adopted.items():
+            for handler in [handler for handler in logger.handlers if isinstance(handler, RouteHandler)]:
+                logger.removeHandler(handler)
+            for handler in self._routes[route]:
+                logger.addHandler(handler)
+        self._adopted = {}
+
+    def adopt_all(self):
+        """Adopt the root logger and every logger that already has handlers, e.g. the device syslog handlers."""
+        self.adopt(logging.getLogger())
+        for logger in list(logging.Logger.manager.loggerDict.values()):
+            if isinstance(logger, logging.Logger):
+                self.adopt(logger)
+
+    def file_handler(self, path, formatter=None, mode='a', rotate=True):
+        """A handler writing to ``path``; text logs rotate at ``max_bytes``, data files such as CSVs must not."""
+        if rotate:
+            if mode == 'w':
+                # RotatingFileHandler always appends, start the file over like a plain handler would
+                open(path, 'w').close()
+            handler = RotatingFileHandler(path, maxBytes=self.max_bytes, backupCount=self.backup_count)
+        else:
+            handler = logging.FileHandler(path, mode=mode)
+        if formatter is not None:
+            handler.setFormatter(formatter)
+        return handler
+
+    def console(self, text):
+        self.put(text, 'CONSOLE')
+
+    def put(self, entry, level):
+        depth = len(self.queue)
+        if depth >= self.max_queue:
+            self.overflows += 1
+            self.dropped[level] = self.dropped.get(level, 0) + 1
+            return
+        self.queue.append(entry)
+        self.enqueued += 1
+        if depth >= self.max_depth:
+            self.max_depth = depth + 1
+
+    def get_stats(self):
+        return {
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'overflows': self.overflows,
+            'dropped': dict(self.dropped),
+            'queue_depth': len(self.queue),
+            'max_depth': self.max_depth,
+        }
+
+    def __listen(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.__write_batch()
+        self.__write_batch()
+
+    def __write_batch(self):
+        if not self.queue:
+            return
+        used = set()
+        for _ in range(len(self.queue)):
+            entry = self.queue.popleft()
+            if isinstance(entry, str):
+                self._console.append(entry)
+            else:
+                for handler in self._routes.get(entry.route, ()):
+                    if entry.levelno >= handler.level:
+                        handler.handle(entry)
+                        used.add(handler)
+            self.written += 1
+
+        for handler in used:
+            handler.flush()
+        if self._console:
+            sys.stdout.write('\n'.join(self._console) + '\n')
+            sys.stdout.flush()
+            self._console = []
+        self.batches += 1
+
+
+_pipeline = None
+
+
+def enable(**options):
+    """Switch this process to asynchronous logging; existing handlers are adopted. Returns the pipeline."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline(**options)
+        _pipeline.start()
+    _pipeline.adopt_all()
+    return _pipeline
+
+
+def disable():
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline.release()
+        _pipeline = None
+
+
+def get_pipeline():
+    """The active pipeline, or None when logging is synchronous."""
+    return _pipeline
+
+
+def _after_fork_in_child():
+    if _pipeline is not None:
+        _pipeline.restart_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+
+from ics_sim.configs import PeerConfig
+
+
+class PeerUnavailable(ConnectionError):
+    """Raised when a peer's circuit is open and no last-known-good value exists."""
+    pass
+
+
+class PeerConnection:
+    """Wraps the protocol client of one peer PLC with a circuit breaker.
+
+    After ``failure_threshold`` consecutive failed requests the circuit opens.
+    While open, reads are served from the last-known-good values and writes
+    fail immediately, so a dead peer costs the scan cycle nothing. A
+    background thread probes the peer with exponential backoff and closes the
+    circuit as soon as a probe succeeds.
+    """
+    STATE_CLOSED = 'closed'
+    STATE_OPEN = 'open'
+
+    def __init__(self, name, client, failure_threshold=PeerConfig.FAILURE_THRESHOLD,
+                 backoff_min=PeerConfig.BACKOFF_MIN, backoff_max=PeerConfig.BACKOFF_MAX, breaker=True):
+        self.name = name
+        self.client = client
+        self.failure_threshold = failure_threshold
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+
+        self._state = self.STATE_CLOSED
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reconnector = None
+        self._last_known = {}
+        self._probe_ids = []
+        # private, so reconnect timing never consumes draws of a seeded global random
+        self._random = random.Random()
+
+        self._requests = 0
+        self._failures = 0
+        self._consecutive_failures = 0
+        self._stale_reads = 0
+        self._rejected_writes = 0
+        self._trips = 0
+        self._reconnects = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_last = 0.0
+        self._last_error = None
+
+    def receive(self, tag_id):
+        return self.receive_many([tag_id])[tag_id]
+
+    def send(self, tag_id, value):
+        self.send_many({tag_id: value})
+
+    def receive_many(self, tag_ids):
+        tag_ids = list(tag_ids)
+        if self.is_open():
+            return self.__last_known(tag_ids)
+        if len(tag_ids) == 1:
+            values = {tag_ids[0]: self.__call(self.client.receive, tag_ids[0])}
+        else:
+            values = self.__call(self.client.receive_many, tag_ids)
+        self._last_known.update(values)
+        self._probe_ids = tag_ids
+        return values
+
+    def send_many(self, values):
+        if self.is_open():
+            self._rejected_writes += 1
+            raise PeerUnavailable('peer {} is unavailable, write dropped'.format(self.name))
+        if len(values) == 1:
+            tag_id, value = next(iter(values.items()))
+            self.__call(self.client.send, tag_id, value)
+        else:
+            self.__call(self.client.send_many, values)
+        self._last_known.update(values)
+
+    def is_open(self):
+        return self._state == self.STATE_OPEN
+
+    def close(self):
+        self._stop_event.set()
+        if self._reconnector is not None:
+            self._reconnector.join(timeout=1)
+        self.client.close()
+
+    def get_stats(self):
+        succeeded = self._requests - self._failures
+        return {
+            'state': self._state,
+            'requests': self._requests,
+            'failures': self._failures,
+            'consecutive_failures': self._consecutive_failures,
+            'stale_reads': self._stale_reads,
+            'rejected_writes': self._rejected_writes,
+            'trips': self._trips,
+            'reconnects': self._reconnects,
+            'latency_last_ms': self._latency_last * 1000,
+            'latency_avg_ms': self._latency_total / succeeded * 1000 if succeeded else 0.0,
+            'latency_max_ms': self._latency_max * 1000,
+            'last_error': self._last_error,
+        }
+
+    def __call(self, method, *args):
+        self._requests += 1
+        start = time.perf_counter()
+        try:
+            result = method(*args)
+        except Exception as e:
+            self.__on_failure(e)
+            raise
+        latency = time.perf_counter() - start
+        self._latency_last = latency
+        self._latency_total += latency
+        self._latency_max = max(self._latency_max, latency)
+        self._consecutive_failures = 0
+        return result
+
+    def __on_failure(self, error):
+        self._failures += 1
+        self._consecutive_failures += 1
+        self._last_error = repr(error)
+        if self.breaker and self._consecutive_failures >= self.failure_threshold:
+            self.__trip()
+
+    def __last_known(self, tag_ids):
+        missing = [tag_id for tag_id in tag_ids if tag_id not in self._last_known]
+        if missing:
+            raise PeerUnavailable('peer {} is unavailable, no last known value for {}'.format(self.name, missing))
+        self._stale_reads += 1
+        return {tag_id: self._last_known[tag_id] for tag_id in tag_ids}
+
+    def __trip(self):
+        with self._lock:
+            if self._state == self.STATE_OPEN or self._stop_event.is_set():
+                return
+            self._state = self.STATE_OPEN
+            self._trips += 1
+            self._reconnector = threading.Thread(target=self.__reconnect, name='peer-' + str(self.name), daemon=True)
+            self._reconnector.start()
+
+    def __reconnect(self):
+        backoff = self.backoff_min
+        while not self._stop_event.wait(backoff * self._random.uniform(0.5, 1.0)):
+            try:
+                self.client.close()
+                if self._probe_ids:
+                    self._last_known.update(self.client.receive_many(self._probe_ids))
+                else:
+                    self.client.receive(0)
+            except Exception as e:
+                self._last_error = repr(e)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+
+            with self._lock:
+                self._reconnects += 1
+                self._consecutive_failures = 0
+                self._state = self.STATE_CLOSED
+            return
+
+
+class PeerManager:
+    """Per-peer connection lifecycle for a DcsComponent: one PeerConnection per PLC."""
+
+    def __init__(self):
+        self.peers = {}
+
+    def add(self, peer_id, client, **options):
+        self.peers[peer_id] = PeerConnection(peer_id, client, **options)
+        return self.peers[peer_id]
+
+    def __getitem__(self, peer_id):
+        return self.peers[peer_id]
+
+    def get_stats(self):
+        return {peer_id: peer.get_stats() for peer_id, peer in self.peers.items()}
+
+    def close(self):
+        for peer in self.peers.values():
+            peer.close()
@@ -0,0 +1,43 @@
+from array import array
+
+
+class ProcessImage:
+    """Input and output image tables of a PLC scan.
+
+    Every tag has a fixed slot in one ``array`` of doubles. The PLC ``load``s
+    the image from one batched read at the start of a scan; ``get`` and
+    ``set`` during the scan only touch the array, and ``set`` marks the slot
+    dirty so the end of the scan can write back just what the logic changed.
+    """
+    def __init__(self, tags):
+        self.tags = list(tags)
+        self.slots = {tag: slot for slot, tag in enumerate(self.tags)}
+        self.values = array('d', bytes(8 * len(self.tags)))
+        self._dirty = bytearray(len(self.tags))
+
+    def __contains__(self, tag):
+        return tag in self.slots
+
+    def load(self, values):
+        slots = self.slots
+        for tag, value in values.items():
+            self.values[slots[tag]] = value
+
+    def get(self, tag):
+        return self.values[self.slots[tag]]
+
+    def get_many(self, tags):
+        return {tag: self.values[self.slots[tag]] for tag in tags}
+
+    def set(self, tag, value):
+        slot = self.slots[tag]
+        self.values[slot] = value
+        self._dirty[slot] = 1
+
+    def take_dirty(self):
+        """The tags written since the last call and their values."""
+        if not any(self._dirty):
+            return {}
+        dirty = {tag: self.values[slot] for slot, tag in enumerate(self.tags) if self._dirty[slot]}
+        self._dirty = bytearray(len(self.tags))
+        return dirty
@@ -1,5 +1,11 @@
+import asyncio
+import os
+import struct
+import tempfile
+import threading
+
 from pyModbusTCP.client import ModbusClient
-from pyModbusTCP.server import ModbusServer, DataBank
+from pyModbusTCP.server import ModbusServer
 
 
 class Client:
@@ -13,6 +19,13 @@ class Client:
     def send(self, tag_id, value):
         pass
 
+    def receive_many(self, tag_ids):
+        return {tag_id: self.receive(tag_id) for tag_id in tag_ids}
+
+    def send_many(self, values):
+        for tag_id, value in values.items():
+            self.send(tag_id, value)
+
 
 class Server:
     def __init__(self, ip, port):
@@ -31,9 +44,59 @@ class Server:
     def get(self, tag_id):
         pass
 
+    def set_many(self, values):
+        for tag_id, value in values.items():
+            self.set(tag_id, value)
+
+    def get_many(self, tag_ids):
+        return {tag_id: self.get(tag_id) for tag_id in tag_ids}
+
+    def get_stats(self):
+        return {}
+
 
 class ModbusBase:
-    def __init__(self, word_num=2, precision=4):
+    """Conversion between tag values and 16-bit holding register words.
+
+    ``fixed`` (default) stores value * 10^precision as an unsigned integer in
+    word_num words. ``float32`` and ``float64`` store IEEE-754 numbers in 2 and 4
+    words. Words are big-endian; ``word_order`` selects whether the most
+    significant word comes first (``big``) or last (``little``).
+    """
+    # registers per request allowed by the Modbus spec (FC3 read, FC16 write)
+    MAX_READ_REGISTERS = 125
+    MAX_WRITE_REGISTERS = 123
+
+    ENCODING_FIXED = 'fixed'
+    ENCODING_FLOAT32 = 'float32'
+    ENCODING_FLOAT64 = 'float64'
+
+    WORD_ORDER_BIG = 'big'
+    WORD_ORDER_LITTLE = 'little'
+
+    # unsigned struct codes holding exactly word_num 16-bit words
+    _STRUCT_CODES = {1: 'H', 2: 'I', 4: 'Q'}
+    _FLOAT_FORMATS = {ENCODING_FLOAT32: ('f', 2), ENCODING_FLOAT64: ('d', 4)}
+
+    def __init__(self, word_num=2, precision=4, encoding=ENCODING_FIXED, word_order=WORD_ORDER_BIG):
+        if encoding in self._FLOAT_FORMATS:
+            code, word_num = self._FLOAT_FORMATS[encoding]
+        elif encoding == self.ENCODING_FIXED:
+            code = self._STRUCT_CODES.get(word_num)
+        else:
+            raise ValueError('%s is not a supported encoding.' % encoding)
+
+        if word_order == self.WORD_ORDER_BIG:
+            self._byte_order = '>'
+        elif word_order == self.WORD_ORDER_LITTLE:
+            # with '<' the words come out low word first, each word still big-endian
+            self._byte_order = '<'
+        else:
+            raise ValueError('%s is not a supported word order.' % word_order)
+
+        self._encoding = encoding
+        self._word_order = word_order
+        self._struct_code = code
         self._precision = precision
         self._word_num = word_num
         self._precision_factor = pow(10, precision)
@@ -45,19 +108,62 @@ class ModbusBase:
         if len(word_array) != self._word_num:
             raise ValueError('word array length is not correct')
 
-        base_holder = 1
+        return self.decode_many(word_array)[0]
+
+    def encode(self, number):
+        return self.encode_many([number])
+
+    def decode_many(self, word_array):
+        """Decode a flat list of words holding len(word_array) / word_num values."""
+        count, remainder = divmod(len(word_array), self._word_num)
+        if remainder:
+            raise ValueError('word array length is not correct')
+
+        order, code = self._byte_order, self._struct_code
+        if code is None:
+            return [self._decode_words(self._big_word_order(word_array[index:index + self._word_num]))
+                    for index in range(0, len(word_array), self._word_num)]
+
+        numbers = struct.unpack('%s%d%s' % (order, count, code), struct.pack('%s%dH' % (order, len(word_array)), *word_array))
+        if self._encoding != self.ENCODING_FIXED:
+            return list(numbers)
+        factor = self._precision_factor
+        return [number / factor for number in numbers]
+
+    def encode_many(self, numbers):
+        """Encode numbers into one flat list of words, word_num words per number."""
+        order, code = self._byte_order, self._struct_code
+        if self._encoding != self.ENCODING_FIXED:
+            packed = struct.pack('%s%d%s' % (order, len(numbers), code), *numbers)
+            return list(struct.unpack('%s%dH' % (order, len(numbers) * self._word_num), packed))
+
+        factor = self._precision_factor
+        integers = [int(number * factor) for number in numbers]
+
+        if code is None or any(integer < 0 or integer >= self._max_int for integer in integers):
+            result = []
+            for integer in integers:
+                result += self._big_word_order(self._encode_integer(integer))
+            return result
+
+        return list(struct.unpack('%s%dH' % (order, len(integers) * self._word_num),
+                                  struct.pack('%s%d%s' % (order, len(integers), code), *integers)))
+
+    def _big_word_order(self, words):
+        if self._word_order == self.WORD_ORDER_LITTLE:
+            return list(reversed(words))
+        return words
+
+    def _decode_words(self, word_array):
         result = 0
 
         for word in word_array:
-            result *= base_holder
+            result *= self._base
             result += word
-            base_holder *= self._base
 
         return result / self._precision_factor
 
-    def encode(self, number):
-
-        number = int(number * self._precision_factor)
+    def _encode_integer(self, number):
 
         if number > self._max_int:
             raise ValueError('input number exceed max limit')
@@ -76,20 +182,57 @@ class ModbusBase:
     def get_registers(self, index):
         return index * self._word_num
 
+    def get_blocks(self, tag_ids, max_registers):
+        """Group tag ids into runs of contiguous registers of at most max_registers.
+
+        Returns a list of (first register, [tag ids in register order]).
+        """
+        blocks = []
+        per_block = max(1, max_registers // self._word_num)
+        for tag_id in sorted(set(tag_ids)):
+            if blocks:
+                start, block_ids = blocks[-1]
+                if block_ids[-1] + 1 == tag_id and len(block_ids) < per_block:
+                    block_ids.append(tag_id)
+                    continue
+            blocks.append((self.get_registers(tag_id), [tag_id]))
+        return blocks
+
 
 class ClientModbus(Client, ModbusBase):
-    def __init__(self, ip, port):
-        ModbusBase.__init__(self)
+    def __init__(self, ip, port, timeout=30.0, encoding=ModbusBase.ENCODING_FIXED, word_order=ModbusBase.WORD_ORDER_BIG):
+        ModbusBase.__init__(self, encoding=encoding, word_order=word_order)
         Client.__init__(self, ip, port)
-        self.client = ModbusClient(host=self.ip, port=self.port)
+        self.client = ModbusClient(host=self.ip, port=self.port, timeout=timeout)
 
     def receive(self, tag_id):
         self.open()
-        return self.decode(self.client.read_holding_registers(self.get_registers(tag_id), self._word_num))
+        words = self.client.read_holding_registers(self.get_registers(tag_id), self._word_num)
+        if words is None:
+            raise ConnectionError('reading tag {} from {}:{} failed'.format(tag_id, self.ip, self.port))
+        return self.decode(words)
 
     def send(self, tag_id, value):
         self.open()
-        self.client.write_multiple_registers(self.get_registers(tag_id), self.encode(value))
+        if not self.client.write_multiple_registers(self.get_registers(tag_id), self.encode(value)):
+            raise ConnectionError('writing tag {} to {}:{} failed'.format(tag_id, self.ip, self.port))
+
+    def receive_many(self, tag_ids):
+        self.open()
+        values = {}
+        for start, block_ids in self.get_blocks(tag_ids, self.MAX_READ_REGISTERS):
+            words = self.client.read_holding_registers(start, len(block_ids) * self._word_num)
+            if words is None:
+                raise ConnectionError('reading registers {} from {}:{} failed'.format(start, self.ip, self.port))
+            values.update(zip(block_ids, self.decode_many(words)))
+        return values
+
+    def send_many(self, values):
+        self.open()
+        for start, block_ids in self.get_blocks(values.keys(), self.MAX_WRITE_REGISTERS):
+            words = self.encode_many([values[tag_id] for tag_id in block_ids])
+            if not self.client.write_multiple_registers(start, words):
+                raise ConnectionError('writing registers {} to {}:{} failed'.format(start, self.ip, self.port))
 
     def open(self):
         if not self.client.is_open:
@@ -100,9 +243,231 @@ class ClientModbus(Client, ModbusBase):
             self.client.close()
 
 
+class ModbusTcp:
+    """Minimal Modbus/TCP framing (MBAP header + PDU) for the holding register functions."""
+    HEADER = struct.Struct('>HHHB')  # transaction id, protocol id, length, unit id
+    READ_HOLDING_REGISTERS = 0x03
+    WRITE_SINGLE_REGISTER = 0x06
+    WRITE_MULTIPLE_REGISTERS = 0x10
+    EXCEPTION_FLAG = 0x80
+
+    @staticmethod
+    def frame(transaction_id, unit_id, pdu):
+        return ModbusTcp.HEADER.pack(transaction_id, 0, len(pdu) + 1, unit_id) + pdu
+
+    @staticmethod
+    async def read_frame(reader):
+        """Return (transaction id, unit id, pdu) of the next frame on the stream."""
+        transaction_id, protocol_id, length, unit_id = ModbusTcp.HEADER.unpack(
+            await reader.readexactly(ModbusTcp.HEADER.size))
+        if protocol_id != 0 or length < 2:
+            raise ConnectionError('invalid Modbus/TCP header')
+        return transaction_id, unit_id, await reader.readexactly(length - 1)
+
+    @staticmethod
+    def read_request(start, count):
+        return struct.pack('>BHH', ModbusTcp.READ_HOLDING_REGISTERS, start, count)
+
+    @staticmethod
+    def write_request(start, words):
+        return struct.pack('>BHHB%dH' % len(words), ModbusTcp.WRITE_MULTIPLE_REGISTERS,
+                           start, len(words), len(words) * 2, *words)
+
+    @staticmethod
+    def parse_response(request, pdu):
+        """Return the register words of a read response, or None for a write response."""
+        if pdu[0] == request[0] | ModbusTcp.EXCEPTION_FLAG:
+            raise ValueError('Modbus exception code {} for function {}'.format(pdu[1], request[0]))
+        if pdu[0] != request[0]:
+            raise ConnectionError('unexpected Modbus function {} in response'.format(pdu[0]))
+        if pdu[0] == ModbusTcp.READ_HOLDING_REGISTERS:
+            return list(struct.unpack('>%dH' % (pdu[1] // 2), pdu[2:2 + pdu[1]]))
+        return None
+
+
+class EventLoopThread:
+    """An asyncio event loop running forever on its own daemon thread."""
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, name='asyncio'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine, timeout=None):
+        """Run a coroutine on the loop from another thread and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    @classmethod
+    def shared(cls):
+        """The loop shared by all blocking callers of the asyncio clients in this process."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = EventLoopThread('modbus-clients')
+        return cls._shared
+
+
+class AsyncClientModbus(Client, ModbusBase):
+    """asyncio Modbus/TCP client with pipelined transactions.
+
+    All requests share a single connection. Up to ``window`` requests are in
+    flight at once; responses are matched to requests by MBAP transaction id
+    and may arrive in any order. The ``*_async`` coroutines bind the client to
+    the caller's event loop. The blocking ``receive``/``send``/``*_many`` methods
+    run on the process wide ``EventLoopThread.shared()`` loop. Use one style per
+    client.
+    """
+    def __init__(self, ip, port, timeout=5.0, unit_id=1, window=16,
+                 encoding=ModbusBase.ENCODING_FIXED, word_order=ModbusBase.WORD_ORDER_BIG):
+        ModbusBase.__init__(self, encoding=encoding, word_order=word_order)
+        Client.__init__(self, ip, port)
+        self.timeout = timeout
+        self.unit_id = unit_id
+        self.window = window
+        self._reader = None
+        self._writer = None
+        self._receiver = None
+        self._loop = None
+        self._slots = None
+        self._connect_lock = None
+        self._pending = {}
+        self._transaction_id = 0
+
+    def receive(self, tag_id):
+        return self.__run(self.receive_async(tag_id))
+
+    def send(self, tag_id, value):
+        return self.__run(self.send_async(tag_id, value))
+
+    def receive_many(self, tag_ids):
+        return self.__run(self.receive_many_async(tag_ids))
+
+    def send_many(self, values):
+        return self.__run(self.send_many_async(values))
+
+    def close(self):
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._disconnect(ConnectionError('client closed'))
+        else:
+            self._loop.call_soon_threadsafe(self._disconnect, ConnectionError('client closed'))
+
+    async def receive_async(self, tag_id):
+        return self.decode(await self.read_registers(self.get_registers(tag_id), self._word_num))
+
+    async def send_async(self, tag_id, value):
+        await self.write_registers(self.get_registers(tag_id), self.encode(value))
+
+    async def receive_many_async(self, tag_ids):
+        blocks = self.get_blocks(tag_ids, self.MAX_READ_REGISTERS)
+        results = await asyncio.gather(*[self.read_registers(start, len(block_ids) * self._word_num)
+                                         for start, block_ids in blocks])
+        values = {}
+        for (start, block_ids), words in zip(blocks, results):
+            values.update(zip(block_ids, self.decode_many(words)))
+        return values
+
+    async def send_many_async(self, values):
+        await asyncio.gather(*[self.write_registers(start, self.encode_many([values[tag_id] for tag_id in block_ids]))
+                               for start, block_ids in self.get_blocks(values.keys(), self.MAX_WRITE_REGISTERS)])
+
+    async def read_registers(self, start, count):
+        return await self._transact(ModbusTcp.read_request(start, count))
+
+    async def write_registers(self, start, words):
+        await self._transact(ModbusTcp.write_request(start, words))
+
+    def get_stats(self):
+        return {'in_flight': len(self._pending), 'window': self.window, 'connected': self._writer is not None}
+
+    async def _connect(self):
+        async with self._connect_lock:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.wait_for(self._open_connection(), self.timeout)
+                self._loop = asyncio.get_running_loop()
+                self._receiver = self._loop.create_task(self.__receive_responses(self._reader))
+
+    def _open_connection(self):
+        return asyncio.open_connection(self.ip, self.port)
+
+    async def _transact(self, request):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.window)
+            self._connect_lock = asyncio.Lock()
+
+        async with self._slots:
+            transaction_id = None
+            try:
+                await self._connect()
+                transaction_id = self.__next_transaction_id()
+                future = self._loop.create_future()
+                self._pending[transaction_id] = (request, future)
+                self._writer.write(ModbusTcp.frame(transaction_id, self.unit_id, request))
+                await self._writer.drain()
+                return await asyncio.wait_for(future, self.timeout)
+            except (OSError, EOFError, asyncio.TimeoutError) as e:
+                error = e if isinstance(e, ConnectionError) else ConnectionError(
+                    'Modbus request to {}:{} failed ({!r})'.format(self.ip, self.port, e))
+                self._disconnect(error)
+                raise error
+            finally:
+                self._pending.pop(transaction_id, None)
+
+    def _disconnect(self, reason):
+        """Drop the connection and fail every request still in flight on it."""
+        if self._receiver is not None and self._receiver is not asyncio.current_task():
+            self._receiver.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = self._receiver = None
+
+        for request, future in self._pending.values():
+            if not future.done():
+                future.set_exception(reason)
+        self._pending.clear()
+
+    async def __receive_responses(self, reader):
+        try:
+            while True:
+                transaction_id, unit_id, pdu = await ModbusTcp.read_frame(reader)
+                request, future = self._pending.get(transaction_id, (None, None))
+                if future is None or future.done():
+                    continue
+                try:
+                    future.set_result(ModbusTcp.parse_response(request, pdu))
+                except (ValueError, ConnectionError, struct.error) as e:
+                    future.set_exception(e)
+        except (OSError, EOFError, asyncio.IncompleteReadError) as e:
+            if self._reader is reader:
+                self._disconnect(ConnectionError('connection to {}:{} lost ({!r})'.format(self.ip, self.port, e)))
+
+    def __next_transaction_id(self):
+        while True:
+            self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+            if self._transaction_id not in self._pending:
+                return self._transaction_id
+
+    def __run(self, coroutine):
+        return EventLoopThread.shared().run(coroutine)
+
+
 class ServerModbus(Server, ModbusBase):
-    def __init__(self, ip, port):
-        ModbusBase.__init__(self)
+    # the local data bank has no protocol limit on block size
+    _max_block_registers = 0x10000
+
+    def __init__(self, ip, port, encoding=ModbusBase.ENCODING_FIXED, word_order=ModbusBase.WORD_ORDER_BIG):
+        ModbusBase.__init__(self, encoding=encoding, word_order=word_order)
         Server.__init__(self, ip, port)
         self.server = ModbusServer(ip, port, no_block=True)
 
@@ -120,19 +485,325 @@ class ServerModbus(Server, ModbusBase):
         return self.decode(self.server.data_bank.get_holding_registers(self.get_registers(tag_id), self._word_num))
         #return self.decode(DataBank.get_words(self.get_registers(tag_id), self._word_num))
 
+    def set_many(self, values):
+        for start, block_ids in self.get_blocks(values.keys(), self._max_block_registers):
+            self.server.data_bank.set_holding_registers(start, self.encode_many([values[tag_id] for tag_id in block_ids]))
+
+    def get_many(self, tag_ids):
+        values = {}
+        for start, block_ids in self.get_blocks(tag_ids, self._max_block_registers):
+            words = self.server.data_bank.get_holding_registers(start, len(block_ids) * self._word_num)
+            values.update(zip(block_ids, self.decode_many(words)))
+        return values
+
+
+
+class RegisterBank:
+    """The 65536 holding registers of a server, kept as big-endian words in one bytearray.
+
+    Every access is a single struct or slice operation, so the PLC thread and
+    the server thread can share a bank without a lock.
+    """
+    SIZE = 0x10000
+
+    def __init__(self):
+        self.data = bytearray(self.SIZE * 2)
+
+    def get(self, start, count):
+        return list(struct.unpack_from('>%dH' % count, self.data, start * 2))
+
+    def set(self, start, words):
+        struct.pack_into('>%dH' % len(words), self.data, start * 2, *words)
+
+    def get_bytes(self, start, count):
+        return bytes(self.data[start * 2:(start + count) * 2])
+
+    def set_bytes(self, start, data):
+        self.data[start * 2:start * 2 + len(data)] = data
+
+
+class AsyncServerModbus(Server, ModbusBase):
+    """asyncio Modbus/TCP server answering holding register reads (FC3) and writes (FC6, FC16).
+
+    All connections are served by one event loop thread from a RegisterBank.
+    ``get_stats`` reports request counters per connection and per function code;
+    the event loop updates them and any thread may read them, under ``_stats_lock``.
+    """
+    ILLEGAL_FUNCTION = 0x01
+    ILLEGAL_DATA_ADDRESS = 0x02
+    ILLEGAL_DATA_VALUE = 0x03
+
+    def __init__(self, ip, port, backlog=1024,
+                 encoding=ModbusBase.ENCODING_FIXED, word_order=ModbusBase.WORD_ORDER_BIG):
+        ModbusBase.__init__(self, encoding=encoding, word_order=word_order)
+        Server.__init__(self, ip, port)
+        self.bank = RegisterBank()
+        self.backlog = backlog
+        self._loop_thread = None
+        self._server = None
+        self._writers = {}
+        self._connection_requests = {}
+        self._function_requests = {}
+        self._total_connections = 0
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        self._loop_thread = EventLoopThread('modbus-server-{}'.format(self.port))
+        self._server = self._loop_thread.run(asyncio.start_server(
+            self.handle_connection, self.ip, self.port, backlog=self.backlog, reuse_address=True))
+
+    def stop(self):
+        if self._loop_thread is not None:
+            self._loop_thread.run(self.__close())
+            self._loop_thread.stop()
+            self._loop_thread = None
+
+    def set(self, tag_id, value):
+        self.bank.set(self.get_registers(tag_id), self.encode(value))
+
+    def get(self, tag_id):
+        return self.decode(self.bank.get(self.get_registers(tag_id), self._word_num))
+
+    def set_many(self, values):
+        for start, block_ids in self.get_blocks(values.keys(), RegisterBank.SIZE):
+            self.bank.set(start, self.encode_many([values[tag_id] for tag_id in block_ids]))
+
+    def get_many(self, tag_ids):
+        values = {}
+        for start, block_ids in self.get_blocks(tag_ids, RegisterBank.SIZE):
+            values.update(zip(block_ids, self.decode_many(self.bank.get(start, len(block_ids) * self._word_num))))
+        return values
+
+    def get_stats(self):
+        with self._stats_lock:
+            return {
+                'connections': len(self._connection_requests),
+                'total_connections': self._total_connections,
+                'requests_per_connection': dict(self._connection_requests),
+                'requests_per_function': dict(self._function_requests),
+            }
+
+    async def handle_connection(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        with self._stats_lock:
+            peer = '{}:{}'.format(*peer[:2]) if isinstance(peer, tuple) else 'connection-{}'.format(self._total_connections)
+            self._total_connections += 1
+            self._connection_requests[peer] = 0
+        self._writers[writer] = asyncio.current_task()
+        try:
+            while True:
+                transaction_id, unit_id, pdu = await ModbusTcp.read_frame(reader)
+                with self._stats_lock:
+                    self._connection_requests[peer] += 1
+                    self._function_requests[pdu[0]] = self._function_requests.get(pdu[0], 0) + 1
+                writer.write(ModbusTcp.frame(transaction_id, unit_id, self.process(pdu)))
+                await writer.drain()
+        except (OSError, EOFError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            with self._stats_lock:
+                del self._connection_requests[peer]
+            self._writers.pop(writer, None)
+            writer.close()
+
+    def process(self, pdu):
+        """Execute one request PDU against the register bank and return the response PDU."""
+        function = pdu[0]
+        try:
+            if function == ModbusTcp.READ_HOLDING_REGISTERS:
+                start, count = struct.unpack_from('>HH', pdu, 1)
+                self.__check_range(start, count, ModbusBase.MAX_READ_REGISTERS)
+                return struct.pack('>BB', function, count * 2) + self.bank.get_bytes(start, count)
+
+            elif function == ModbusTcp.WRITE_SINGLE_REGISTER:
+                if len(pdu) < 5:
+                    raise ValueError(self.ILLEGAL_DATA_VALUE)
+                self.bank.set_bytes(struct.unpack_from('>H', pdu, 1)[0], pdu[3:5])
+                return pdu[:5]
+
+            elif function == ModbusTcp.WRITE_MULTIPLE_REGISTERS:
+                start, count, byte_count = struct.unpack_from('>HHB', pdu, 1)
+                self.__check_range(start, count, ModbusBase.MAX_WRITE_REGISTERS)
+                if byte_count != count * 2 or len(pdu) < 6 + byte_count:
+                    raise ValueError(self.ILLEGAL_DATA_VALUE)
+                self.bank.set_bytes(start, pdu[6:6 + byte_count])
+                return struct.pack('>BHH', function, start, count)
+
+            raise ValueError(self.ILLEGAL_FUNCTION)
+        except struct.error:
+            code = self.ILLEGAL_DATA_VALUE
+        except ValueError as e:
+            code = e.args[0]
+        return struct.pack('>BB', function | ModbusTcp.EXCEPTION_FLAG, code)
+
+    def __check_range(self, start, count, max_count):
+        if not 1 <= count <= max_count:
+            raise ValueError(self.ILLEGAL_DATA_VALUE)
+        if start + count > RegisterBank.SIZE:
+            raise ValueError(self.ILLEGAL_DATA_ADDRESS)
+
+    async def __close(self):
+        self._server.close()
+        handlers = list(self._writers.values())
+        for writer in list(self._writers):
+            writer.close()
+        if handlers:
+            await asyncio.wait(handlers, timeout=1)
+        await self._server.wait_closed()
+
+
+class LoopbackServerModbus(AsyncServerModbus):
+    """Modbus server for devices on the same host, no TCP port is allocated.
+
+    Clients in the same process find the server in ``registry`` by (ip, port)
+    and access its RegisterBank directly. Clients in other processes connect
+    to a UNIX domain socket served by the same ``handle_connection`` as the
+    TCP server, so both paths behave exactly like Modbus/TCP.
+    """
+    registry = {}
+
+    def __init__(self, ip, port, encoding=ModbusBase.ENCODING_FIXED, word_order=ModbusBase.WORD_ORDER_BIG):
+        AsyncServerModbus.__init__(self, ip, port, encoding=encoding, word_order=word_order)
+        self.path = self.socket_path(ip, port)
+
+    @staticmethod
+    def socket_path(ip, port):
+        return os.path.join(tempfile.gettempdir(), 'ics_sim-modbus-{}-{}.sock'.format(ip, port))
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._loop_thread = EventLoopThread('modbus-loopback-{}'.format(self.port))
+        self._server = self._loop_thread.run(asyncio.start_unix_server(self.handle_connection, self.path))
+        LoopbackServerModbus.registry[(self.ip, self.port)] = self
+
+    def stop(self):
+        if LoopbackServerModbus.registry.get((self.ip, self.port)) is self:
+            del LoopbackServerModbus.registry[(self.ip, self.port)]
+        AsyncServerModbus.stop(self)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class UnixClientModbus(AsyncClientModbus):
+    """AsyncClientModbus speaking Modbus/TCP framing over a UNIX domain socket."""
+
+    def __init__(self, path, timeout=5.0, unit_id=1, window=16,
+                 encoding=ModbusBase.ENCODING_FIXED, word_order=ModbusBase.WORD_ORDER_BIG):
+        AsyncClientModbus.__init__(self, path, 0, timeout=timeout, unit_id=unit_id, window=window,
+                                   encoding=encoding, word_order=word_order)
+        self.path = path
+
+    def _open_connection(self):
+        return asyncio.open_unix_connection(self.path)
+
+
+class LoopbackClientModbus(Client, ModbusBase):
+    """Client of a LoopbackServerModbus.
+
+    Reads and writes go straight to the server's RegisterBank when the server
+    runs in this process, and over its UNIX domain socket otherwise.
+    """
+    def __init__(self, ip, port, timeout=5.0, window=16,
+                 encoding=ModbusBase.ENCODING_FIXED, word_order=ModbusBase.WORD_ORDER_BIG):
+        ModbusBase.__init__(self, encoding=encoding, word_order=word_order)
+        Client.__init__(self, ip, port)
+        self.remote = UnixClientModbus(LoopbackServerModbus.socket_path(ip, port), timeout=timeout, window=window,
+                                       encoding=encoding, word_order=word_order)
+
+    def receive(self, tag_id):
+        bank = self.__local_bank()
+        if bank is None:
+            return self.remote.receive(tag_id)
+        return self.decode(bank.get(self.get_registers(tag_id), self._word_num))
+
+    def send(self, tag_id, value):
+        bank = self.__local_bank()
+        if bank is None:
+            return self.remote.send(tag_id, value)
+        bank.set(self.get_registers(tag_id), self.encode(value))
+
+    def receive_many(self, tag_ids):
+        bank = self.__local_bank()
+        if bank is None:
+            return self.remote.receive_many(tag_ids)
+        values = {}
+        for start, block_ids in self.get_blocks(tag_ids, RegisterBank.SIZE):
+            values.update(zip(block_ids, self.decode_many(bank.get(start, len(block_ids) * self._word_num))))
+        return values
+
+    def send_many(self, values):
+        bank = self.__local_bank()
+        if bank is None:
+            return self.remote.send_many(values)
+        for start, block_ids in self.get_blocks(values.keys(), RegisterBank.SIZE):
+            bank.set(start, self.encode_many([values[tag_id] for tag_id in block_ids]))
+
+    def close(self):
+        self.remote.close()
+
+    def __local_bank(self):
+        server = LoopbackServerModbus.registry.get((self.ip, self.port))
+        return server.bank if server is not None else None
 
 
 class ProtocolFactory:
+    """Creates protocol clients and servers.
+
+    ``options`` come from the PLC configuration. ``encoding`` and ``word_order``
+    select the register format (see ModbusBase) and must match on both sides.
+    ``client_engine`` and ``server_engine`` select the implementation:
+    ``pymodbus`` (pyModbusTCP, default) or ``asyncio`` (AsyncClientModbus,
+    AsyncServerModbus). The ``loopback`` protocol (LoopbackClientModbus,
+    LoopbackServerModbus) serves the same registers without TCP, for devices
+    on one host. ``pipeline_window`` sets how many requests an asyncio
+    client keeps in flight on its connection. ``timeout`` bounds a single
+    client request in seconds.
+    """
+    ENGINE_PYMODBUS = 'pymodbus'
+    ENGINE_ASYNCIO = 'asyncio'
+    PROTOCOL_MODBUS_TCP = 'ModbusWriteRequest-TCP'
+    PROTOCOL_LOOPBACK = 'loopback'
+
     @staticmethod
-    def create_client(protocol, ip, port):
-        if protocol == 'ModbusWriteRequest-TCP':
-            return ClientModbus(ip, port)
+    def create_client(protocol, ip, port, **options):
+        if protocol == ProtocolFactory.PROTOCOL_MODBUS_TCP:
+            engine = options.get('client_engine', ProtocolFactory.ENGINE_PYMODBUS)
+            if engine == ProtocolFactory.ENGINE_PYMODBUS:
+                return ClientModbus(ip, port, **ProtocolFactory.__client_options(options))
+            elif engine == ProtocolFactory.ENGINE_ASYNCIO:
+                return AsyncClientModbus(ip, port, **ProtocolFactory.__client_options(options, pipelined=True))
+            else:
+                raise ValueError('%s is not a supported client engine.' % engine)
+        elif protocol == ProtocolFactory.PROTOCOL_LOOPBACK:
+            return LoopbackClientModbus(ip, port, **ProtocolFactory.__client_options(options, pipelined=True))
         else:
             raise TypeError()
 
     @staticmethod
-    def create_server(protocol, ip, port):
-        if protocol == 'ModbusWriteRequest-TCP':
-            return ServerModbus(ip, port)
+    def create_server(protocol, ip, port, **options):
+        if protocol == ProtocolFactory.PROTOCOL_MODBUS_TCP:
+            engine = options.get('server_engine', ProtocolFactory.ENGINE_PYMODBUS)
+            if engine == ProtocolFactory.ENGINE_PYMODBUS:
+                return ServerModbus(ip, port, **ProtocolFactory.__codec_options(options))
+            elif engine == ProtocolFactory.ENGINE_ASYNCIO:
+                return AsyncServerModbus(ip, port, **ProtocolFactory.__codec_options(options))
+            else:
+                raise ValueError('%s is not a supported server engine.' % engine)
+        elif protocol == ProtocolFactory.PROTOCOL_LOOPBACK:
+            return LoopbackServerModbus(ip, port, **ProtocolFactory.__codec_options(options))
         else:
             raise TypeError()
+
+    @staticmethod
+    def __codec_options(options):
+        return {key: options[key] for key in ('encoding', 'word_order') if key in options}
+
+    @staticmethod
+    def __client_options(options, pipelined=False):
+        client_options = ProtocolFactory.__codec_options(options)
+        if 'timeout' in options:
+            client_options['timeout'] = options['timeout']
+        if pipelined and 'pipeline_window' in options:
+            client_options['window'] = options['pipeline_window']
+        return client_options
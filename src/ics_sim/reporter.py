@@ -0,0 +1,90 @@
+import threading
+import time
+
+
+class RateLimitedReporter:
+    """Collapses repeated messages and samples noisy levels before they reach ``emit(level, text)``.
+
+    Messages are keyed by level and format string (or an explicit ``key``).
+    The first message of a key is emitted at once; repeats within ``window``
+    seconds are only counted, and the count is emitted with the next message
+    of that key after the window, or by ``flush``. ``sample_every`` maps a
+    level to N so that only every Nth message of that level is considered at
+    all. ``msg % args`` is evaluated only for messages that are emitted.
+    ``log`` and ``flush`` may be called from different threads, e.g. the scan
+    thread and the thread stopping the device.
+    """
+    def __init__(self, emit, window=5.0, sample_every=None, enabled=None, clock=time.monotonic):
+        self.emit = emit
+        self.window = window
+        self.sample_every = dict(sample_every or {})
+        self.enabled = enabled
+        self.clock = clock
+        self._entries = {}
+        self._level_counts = {}
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+
+        self.emitted = 0
+        self.suppressed = 0
+        self.sampled_out = 0
+
+    def log(self, level, msg, *args, key=None):
+        if self.enabled is not None and not self.enabled(level):
+            return
+        with self._lock:
+            self.__log(level, msg, args, key)
+
+    def flush(self):
+        """Emit the counts of everything suppressed so far."""
+        with self._lock:
+            for (level, _), entry in self._entries.items():
+                if entry[1]:
+                    msg, args = entry[2]
+                    self.__emit(level, msg, args, entry[1])
+            self._entries = {}
+
+    def get_stats(self):
+        return {'emitted': self.emitted, 'suppressed': self.suppressed, 'sampled_out': self.sampled_out}
+
+    def __log(self, level, msg, args, key):
+        every = self.sample_every.get(level)
+        if every:
+            count = self._level_counts.get(level, 0)
+            self._level_counts[level] = count + 1
+            if count % every:
+                self.sampled_out += 1
+                return
+
+        now = self.clock()
+        if now >= self._next_sweep:
+            self.__sweep(now)
+
+        key = (level, msg if key is None else key)
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[0] < self.window:
+            entry[1] += 1
+            entry[2] = (msg, args)
+            self.suppressed += 1
+            return
+
+        repeated = entry[1] if entry is not None else 0
+        self._entries[key] = [now, 0, None]
+        self.__emit(level, msg, args, repeated)
+
+    def __sweep(self, now):
+        # report what a key suppressed once its window is over, even if the key never comes back
+        for key, entry in list(self._entries.items()):
+            if now - entry[0] >= self.window:
+                if entry[1]:
+                    msg, args = entry[2]
+                    self.__emit(key[0], msg, args, entry[1])
+                del self._entries[key]
+        self._next_sweep = now + self.window
+
+    def __emit(self, level, msg, args, repeated):
+        text = msg % args if args else msg
+        if repeated:
+            text = '{} (repeated {} times in {:g}s)'.format(text, repeated, self.window)
+        self.emitted += 1
+        self.emit(level, text)
@@ -0,0 +1,108 @@
+from ics_sim.clock import get_clock
+
+
+class CycleScheduler:
+    """Absolute-deadline cycle scheduler on the monotonic clock.
+
+    Deadlines are ``origin + n * period`` in the ``monotonic_ns`` time of the
+    clock (the global clock by default, see ics_sim.clock), so sleep error
+    never accumulates and wall clock jumps do not move them. The origin is
+    aligned to the same epoch millisecond grid as ``current_milli_cycle_time``,
+    and ``begin_cycle`` returns the nominal epoch millisecond time of the cycle.
+
+    When a cycle ends after the next deadline, the overrun policy decides:
+      skip      resume on the next deadline still ahead, dropping the missed ones
+      catch-up  run the missed cycles back to back until on schedule again
+      stretch   restart the deadline grid from the end of the late cycle
+    """
+    POLICY_SKIP = 'skip'
+    POLICY_CATCH_UP = 'catch-up'
+    POLICY_STRETCH = 'stretch'
+    POLICIES = (POLICY_SKIP, POLICY_CATCH_UP, POLICY_STRETCH)
+
+    def __init__(self, period_ms, policy=POLICY_SKIP, clock=None):
+        self.period_ms = period_ms
+        self.period_ns = period_ms * 1000000
+        self.set_policy(policy)
+        self.clock = get_clock() if clock is None else clock
+        self.deadline_ns = 0
+        self.cycle_time_ms = 0
+        self._missed_until_ns = 0
+        self.reset_stats()
+
+    def start(self, now_ns=None):
+        """Anchor the grid. Returns the epoch millisecond time of the origin; the first deadline is one period later."""
+        now_ns = self.clock.monotonic_ns() if now_ns is None else now_ns
+        epoch_ns = self.clock.time_ns()
+        origin_ms = round(epoch_ns / 1e6 / self.period_ms) * self.period_ms
+        self.cycle_time_ms = origin_ms
+        self.deadline_ns = now_ns + (origin_ms * 1000000 - epoch_ns) + self.period_ns
+        self._missed_until_ns = self.deadline_ns - self.period_ns
+        return origin_ms
+
+    def set_policy(self, policy):
+        """Change the overrun policy; the deadline grid and the statistics are kept."""
+        if policy not in self.POLICIES:
+            raise ValueError('{} is not a supported overrun policy.'.format(policy))
+        self.policy = policy
+
+    def wait(self):
+        """Sleep until the next deadline."""
+        self.clock.sleep_until(self.deadline_ns)
+
+    def begin_cycle(self, now_ns=None):
+        """Account the start of the due cycle and return its nominal epoch millisecond time."""
+        now_ns = self.clock.monotonic_ns() if now_ns is None else now_ns
+        lateness = max(0, now_ns - self.deadline_ns)
+        self.cycles += 1
+        self.jitter_last_ns = lateness
+        self.jitter_max_ns = max(self.jitter_max_ns, lateness)
+        self._jitter_total_ns += lateness
+        self.cycle_time_ms += self.period_ms
+        return self.cycle_time_ms
+
+    def end_cycle(self, now_ns=None):
+        """Set the next deadline according to the overrun policy."""
+        now_ns = self.clock.monotonic_ns() if now_ns is None else now_ns
+        next_deadline = self.deadline_ns + self.period_ns
+        if now_ns < next_deadline:
+            self.deadline_ns = next_deadline
+            return
+
+        self.overruns += 1
+        # while catching up, deadlines already counted come due again
+        first_missed = max(next_deadline, self._missed_until_ns + self.period_ns)
+        if now_ns >= first_missed:
+            missed = (now_ns - first_missed) // self.period_ns + 1
+            self.missed_deadlines += missed
+            self._missed_until_ns = first_missed + (missed - 1) * self.period_ns
+
+        if self.policy == self.POLICY_SKIP:
+            skipped = (now_ns - next_deadline) // self.period_ns + 1
+            self.deadline_ns = next_deadline + skipped * self.period_ns
+            self.cycle_time_ms += skipped * self.period_ms
+        elif self.policy == self.POLICY_CATCH_UP:
+            self.deadline_ns = next_deadline
+        else:
+            self.cycle_time_ms += (now_ns - self.deadline_ns) // 1000000
+            self.deadline_ns = now_ns + self.period_ns
+
+    def reset_stats(self):
+        self.cycles = 0
+        self.overruns = 0
+        self.missed_deadlines = 0
+        self.jitter_last_ns = 0
+        self.jitter_max_ns = 0
+        self._jitter_total_ns = 0
+
+    def get_stats(self):
+        return {
+            'policy': self.policy,
+            'period_ms': self.period_ms,
+            'cycles': self.cycles,
+            'overruns': self.overruns,
+            'missed_deadlines': self.missed_deadlines,
+            'jitter_last_ms': self.jitter_last_ns / 1e6,
+            'jitter_avg_ms': self._jitter_total_ns / self.cycles / 1e6 if self.cycles else 0.0,
+            'jitter_max_ms': self.jitter_max_ns / 1e6,
+        }
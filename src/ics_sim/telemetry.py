@@ -0,0 +1,139 @@
+import threading
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CycleTelemetry:
+    """Fixed-size ring buffer of per-cycle scan statistics.
+
+    Every field is its own preallocated ``array``, so recording a cycle is a
+    handful of index assignments and never allocates. Percentiles are
+    computed over the cycles currently in the buffer; ``count`` and ``total``
+    cover every cycle ever recorded.
+    """
+    FIELDS = ('timestamp_ms', 'latency_ms', 'logic_ms', 'cycle_ms')
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.count = 0
+        self._columns = {field: array('d', bytes(8 * size)) for field in self.FIELDS}
+        self._overruns = array('b', bytes(size))
+        self._totals = array('d', bytes(8 * 3))
+
+    def record(self, timestamp_ms, latency_ms, logic_ms, cycle_ms, overrun):
+        index = self.count % self.size
+        self._columns['timestamp_ms'][index] = timestamp_ms
+        self._columns['latency_ms'][index] = latency_ms
+        self._columns['logic_ms'][index] = logic_ms
+        self._columns['cycle_ms'][index] = cycle_ms
+        self._overruns[index] = overrun
+        totals = self._totals
+        totals[0] += latency_ms
+        totals[1] += logic_ms
+        totals[2] += cycle_ms
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def values(self, field):
+        """The buffered values of ``field``, oldest first."""
+        column = self._columns[field] if field != 'overrun' else self._overruns
+        if self.count <= self.size:
+            return column[:self.count].tolist()
+        start = self.count % self.size
+        return (column[start:] + column[:start]).tolist()
+
+    def total(self, field):
+        """Sum of ``field`` over every cycle recorded, latency_ms, logic_ms or cycle_ms."""
+        if field not in self.FIELDS[1:]:
+            raise ValueError('No total is kept for {}.'.format(field))
+        return self._totals[self.FIELDS.index(field) - 1]
+
+    def percentiles(self, field, quantiles=(0.5, 0.95, 0.99)):
+        ordered = sorted(self.values(field))
+        if not ordered:
+            return {quantile: 0.0 for quantile in quantiles}
+        return {quantile: ordered[min(len(ordered) - 1, int(quantile * len(ordered)))] for quantile in quantiles}
+
+    def overrun_ratio(self):
+        return sum(self.values('overrun')) / len(self) if len(self) else 0.0
+
+
+class MetricsServer:
+    """Serves the scan telemetry of Runnables in Prometheus text format on ``http://ip:port/metrics``."""
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, port, ip='127.0.0.1'):
+        self.ip = ip
+        self.port = port
+        self._runnables = []
+        self._server = None
+
+    def add(self, runnable):
+        self._runnables.append(runnable)
+
+    def start(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.ip, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def render(self):
+        lines = []
+        counters = (
+            ('ics_sim_cycles_total', 'counter', 'Scan cycles run.', 'cycles'),
+            ('ics_sim_overruns_total', 'counter', 'Cycles that ended after the next deadline.', 'overruns'),
+            ('ics_sim_missed_deadlines_total', 'counter', 'Cycle deadlines that passed unmet.', 'missed_deadlines'),
+        )
+        stats = {runnable.name(): runnable.get_scheduler_stats() for runnable in self._runnables}
+        for metric, kind, help_text, key in counters:
+            lines.append('# HELP {} {}'.format(metric, help_text))
+            lines.append('# TYPE {} {}'.format(metric, kind))
+            for name, values in stats.items():
+                lines.append('{}{{device="{}"}} {}'.format(metric, name, values[key]))
+
+        summaries = (
+            ('ics_sim_cycle_latency_ms', 'Delay between a cycle deadline and its start, quantiles over the buffered '
+             'cycles.', 'latency_ms'),
+            ('ics_sim_logic_ms', 'Time spent in _logic, quantiles over the buffered cycles.', 'logic_ms'),
+            ('ics_sim_cycle_ms', 'Time spent in a whole cycle, quantiles over the buffered cycles.', 'cycle_ms'),
+        )
+        for metric, help_text, field in summaries:
+            lines.append('# HELP {} {}'.format(metric, help_text))
+            lines.append('# TYPE {} summary'.format(metric))
+            for runnable in self._runnables:
+                telemetry = runnable.get_telemetry()
+                for quantile, value in telemetry.percentiles(field, self.QUANTILES).items():
+                    lines.append('{}{{device="{}",quantile="{}"}} {}'.format(metric, runnable.name(), quantile, value))
+                lines.append('{}_sum{{device="{}"}} {}'.format(metric, runnable.name(), telemetry.total(field)))
+                lines.append('{}_count{{device="{}"}} {}'.format(metric, runnable.name(), telemetry.count))
+
+        lines.append('# HELP ics_sim_overrun_ratio Share of buffered cycles that overran.')
+        lines.append('# TYPE ics_sim_overrun_ratio gauge')
+        for runnable in self._runnables:
+            lines.append('ics_sim_overrun_ratio{{device="{}"}} {}'.format(runnable.name(),
+                                                                          runnable.get_telemetry().overrun_ratio()))
+        return '\n'.join(lines) + '\n'
@@ -1,4 +1,6 @@
+import argparse
 import random
+import time
 
 from pyModbusTCP.server import ModbusServer
 
@@ -13,22 +15,118 @@ from Configs import Connection, TAG
 
 from ics_sim.protocol import ProtocolFactory
 from ics_sim.connectors import FileConnector, ConnectorFactory
-
-factory = FactorySimulation()
-factory.start()
-
-
-plc1 = PLC1()
-# plc1.set_record_variables(True)
-plc1.start()
-
-
-plc2 = PLC2()
-# plc2.set_record_variables(True)
-plc2.start()
-
-hmi1 = HMI1()
-hmi1.start()
+from ics_sim.executor import CooperativeExecutor
+from ics_sim.launcher import ProcessLauncher
+from ics_sim.telemetry import MetricsServer
+from ics_sim import logqueue
+from ics_sim.clock import ScaledClock, VirtualClock, set_clock
+from ics_sim.lockstep import LockstepSimulation
+
+parser = argparse.ArgumentParser(description='Run the factory, PLCs and HMI in one process')
+parser.add_argument('--mode', choices=['thread', 'executor', 'process', 'lockstep'], default='thread',
+                    help='thread: one thread per device, executor: all devices on one cooperative thread, '
+                         'process: one process per device, lockstep: factory and PLCs stepped in a fixed order '
+                         'on virtual time, reproducible with --seed, PLC snapshots are recorded')
+parser.add_argument('--seed', type=int, default=0, help='in lockstep mode, seed of the random faults and noise')
+parser.add_argument('--pin', action='store_true', help='in process mode, pin every device to its own CPU')
+parser.add_argument('--metrics-port', type=int,
+                    help='in thread and executor mode, serve scan telemetry in Prometheus format on this local port')
+parser.add_argument('--async-logging', action='store_true',
+                    help='write logs, console output and syslog from a background thread')
+parser.add_argument('--clock', choices=['wall', 'scaled', 'virtual'], default='wall',
+                    help='wall: real time, scaled: real time times --speed, '
+                         'virtual: simulated time as fast as the CPU allows (executor mode only; lockstep mode '
+                         'always runs on virtual time)')
+parser.add_argument('--speed', type=float, default=10.0, help='with --clock scaled, how much faster than real time')
+parser.add_argument('--duration', type=float,
+                    help='in thread, executor and lockstep mode, stop after this many seconds of simulated time')
+args = parser.parse_args()
+
+if args.mode == 'lockstep':
+    if args.clock == 'scaled':
+        parser.error('--mode lockstep runs on virtual time, it cannot use --clock scaled')
+elif args.clock == 'virtual' and args.mode != 'executor':
+    parser.error('--clock virtual needs --mode executor or --mode lockstep')
+elif args.clock == 'scaled':
+    set_clock(ScaledClock(args.speed))
+elif args.clock == 'virtual':
+    set_clock(VirtualClock())
+
+if args.async_logging:
+    logqueue.enable()
+
+metrics = MetricsServer(args.metrics_port) if args.metrics_port else None
+
+devices = []
+if args.mode == 'lockstep':
+    # before the devices, they take the lockstep clock when created
+    lockstep = LockstepSimulation(args.seed)
+    devices = [FactorySimulation(), PLC1(), PLC2()]
+    for device in devices:
+        lockstep.add(device)
+        if metrics:
+            metrics.add(device)
+    # a lockstep run exists for its trace, the PLC snapshots in logs/snapshots_*.csv
+    for plc in devices[1:]:
+        plc.set_record_variables(True)
+
+elif args.mode == 'executor':
+    executor = CooperativeExecutor()
+    devices = [FactorySimulation(), PLC1(), PLC2(), HMI1()]
+    for device in devices:
+        executor.add(device)
+        if metrics:
+            metrics.add(device)
+    executor.start()
+
+elif args.mode == 'process':
+    launcher = ProcessLauncher()
+    cpus = ProcessLauncher.available_cpus()
+    for index, device in enumerate((FactorySimulation, PLC1, PLC2, HMI1)):
+        launcher.add(device.__name__, device, cpus[index % len(cpus)] if args.pin else None)
+    launcher.start()
+    launcher.forward_signals()
+    launcher.wait()
+
+else:
+    factory = FactorySimulation()
+    factory.start()
+
+
+    plc1 = PLC1()
+    # plc1.set_record_variables(True)
+    plc1.start()
+
+
+    plc2 = PLC2()
+    # plc2.set_record_variables(True)
+    plc2.start()
+
+    hmi1 = HMI1()
+    hmi1.start()
+
+    devices = [factory, plc1, plc2, hmi1]
+    if metrics:
+        for device in devices:
+            metrics.add(device)
+
+if metrics:
+    metrics.start()
+
+if args.mode == 'lockstep':
+    lockstep.run(args.duration)
+    lockstep.stop()
+
+elif args.duration and devices:
+    clock = devices[0].get_clock()
+    end = clock.monotonic() + args.duration
+    while clock.monotonic() < end:
+        time.sleep(0.1)
+    if args.mode == 'executor':
+        executor.stop()
+    else:
+        for device in devices:
+            device.stop()
 
 """
 
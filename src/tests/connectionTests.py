@@ -1,3 +1,7 @@
+import os
+import struct
+import tempfile
+import threading
 import unittest
 from Configs import Connection
 
@@ -63,3 +67,219 @@ class ConnectionTests(unittest.TestCase):
 
         except Exception:
             self.fail("cannot init values in the connection!")
+
+    def test_sqlite_pooled_connection(self):
+        with tempfile.TemporaryDirectory() as folder:
+            connection = ConnectorFactory.build({
+                'type': 'sqlite',
+                'path': os.path.join(folder, 'pooled.sqlite'),
+                'name': 'fp_table',
+                'options': {'pooled': True},
+            })
+            connection.initialize([('value1', 1), ('value2', 2)])
+
+            for value in range(10):
+                connection.set('value1', value)
+                self.assertEqual(connection.get('value1'), value, 'pooled sqliteConnection is not working correctly')
+
+            worker = threading.Thread(target=connection.set, args=('value2', 20))
+            worker.start()
+            worker.join()
+            self.assertEqual(connection.get('value2'), 20, 'pooled sqliteConnection is not thread safe')
+
+            stats = connection.get_stats()
+            self.assertEqual(stats['opens'], 2, 'pooled sqliteConnection must open one connection per thread')
+            self.assertEqual(stats['commits'], 12)
+            connection.close()
+
+    def test_batched_access(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for connection in [
+                ConnectorFactory.build({'type': 'sqlite', 'path': os.path.join(folder, 'batch.sqlite'), 'name': 'fp_table'}),
+                ConnectorFactory.build({'type': 'file', 'path': os.path.join(folder, 'batch.json'), 'name': 'fp_table'}),
+            ]:
+                connection.initialize([('value1', 1), ('value2', 2), ('value3', 3)])
+
+                self.assertEqual(connection.get_many(['value1', 'value3']), {'value1': 1, 'value3': 3})
+
+                connection.set_many({'value1': 10, 'value2': 20})
+                self.assertEqual(connection.get_many(['value1', 'value2', 'value3']),
+                                 {'value1': 10, 'value2': 20, 'value3': 3},
+                                 'set_many in {} is not working correctly'.format(type(connection).__name__))
+                self.assertEqual(connection.get('value2'), 20)
+
+            # a failed read returns nothing instead of None
+            broken = ConnectorFactory.build({'type': 'sqlite', 'path': os.path.join(folder, 'batch.sqlite'),
+                                             'name': 'missing_table'})
+            self.assertEqual(broken.get_many(['value1']), {})
+            self.assertEqual(broken.get_versions(['value1']), {})
+            self.assertEqual(broken.snapshot(['value1']), (None, {}))
+
+    def test_shm_connection(self):
+        name = 'ics_sim_test_{}'.format(os.getpid())
+        writer = ConnectorFactory.build({'type': 'shm', 'path': name, 'name': 'fp_table'})
+        reader = ConnectorFactory.build({'type': 'shm', 'path': name, 'name': 'fp_table'})
+        try:
+            self.assertRaises(FileNotFoundError, reader.get, 'value1')
+
+            writer.initialize([('value1', 1), ('value2', 2)])
+            self.assertEqual(reader.get('value1'), 1, 'get function in SharedMemoryConnector is not working correctly')
+
+            writer.set('value1', 10)
+            self.assertEqual(reader.get('value1'), 10, 'set function in SharedMemoryConnector is not working correctly')
+
+            reader.set_many({'value1': 5.5, 'value2': -7.25})
+            self.assertEqual(writer.get_many(['value1', 'value2']), {'value1': 5.5, 'value2': -7.25})
+
+            # a rejected write leaves the table readable
+            self.assertRaises(KeyError, writer.set_many, {'value1': 1.0, 'zzz': 1.0})
+            self.assertRaises(struct.error, writer.set, 'value1', None)
+            self.assertEqual(reader.get_many(['value1', 'value2']), {'value1': 5.5, 'value2': -7.25})
+            self.assertEqual(reader.get('value1'), 5.5)
+
+            # both slots are always written together, a consistent reader never sees them differ
+            writer.set_many({'value1': 0, 'value2': 0})
+            stop = threading.Event()
+
+            def write_pairs():
+                value = 0
+                while not stop.is_set():
+                    value += 1
+                    writer.set_many({'value1': value, 'value2': value})
+
+            thread = threading.Thread(target=write_pairs)
+            thread.start()
+            try:
+                for _ in range(2000):
+                    pair = reader.get_many(['value1', 'value2'])
+                    self.assertEqual(pair['value1'], pair['value2'], 'SharedMemoryConnector returned a torn read')
+            finally:
+                stop.set()
+                thread.join()
+        finally:
+            reader.close()
+            writer.unlink()
+
+    def test_file_connection(self):
+        with tempfile.TemporaryDirectory() as folder:
+            connection = {
+                'type': 'file',
+                'path': os.path.join(folder, 'sensors_actuators.tags'),
+                'name': 'fp_table',
+                'options': {'sync_interval': 0},
+            }
+            writer = ConnectorFactory.build(connection)
+            writer.initialize([('value{}'.format(index), index) for index in range(1000)])
+            writer.set('value500', 5.25)
+            writer.close()
+
+            reader = ConnectorFactory.build(connection)
+            self.assertEqual(reader.get('value500'), 5.25, 'FileConnector does not persist values')
+            self.assertEqual(reader.get('value999'), 999)
+            reader.close()
+
+    def test_cached_connection(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'cached.sqlite')
+            connection = ConnectorFactory.build({
+                'type': 'sqlite',
+                'path': path,
+                'name': 'fp_table',
+                'options': {'cache': True},
+            })
+            backend = ConnectorFactory.build({'type': 'sqlite', 'path': path, 'name': 'fp_table'})
+            connection.initialize([('value1', 1), ('value2', 2)], clear_old=True)
+
+            self.assertEqual(connection.get('value1'), 1)
+            self.assertEqual(connection.get('value1'), 1)
+            connection.set('value2', 20)
+            self.assertEqual(connection.get('value2'), 20, 'cached connection must read its own writes')
+            self.assertEqual(backend.get('value2'), 2, 'cached connection must not write before flush')
+
+            connection.flush()
+            self.assertEqual(backend.get('value2'), 20, 'flush in CachedConnector is not working correctly')
+
+            backend.set('value1', 10)
+            self.assertEqual(connection.get('value1'), 1)
+            connection.refresh()
+            self.assertEqual(connection.get('value1'), 10, 'refresh in CachedConnector is not working correctly')
+
+            stats = connection.get_stats()
+            self.assertEqual(stats['misses'], 1)
+            self.assertEqual(stats['hits'], 4)
+            self.assertEqual(stats['flushes'], 1)
+
+            # a restart initializes the existing table again with the backend default
+            connection.initialize([('value1', 1), ('value2', 2)])
+            self.assertEqual(backend.get('value2'), 2)
+
+    def test_change_notification(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for connection in [
+                ConnectorFactory.build({'type': 'sqlite', 'path': os.path.join(folder, 'notify.sqlite'), 'name': 'fp_table',
+                                        'options': {'poll_interval': 1}}),
+                ConnectorFactory.build({'type': 'file', 'path': os.path.join(folder, 'notify.tags'), 'name': 'fp_table',
+                                        'options': {'poll_interval': 1}}),
+            ]:
+                connection.initialize([('value1', 1), ('value2', 2)])
+                versions = connection.get_versions(['value1', 'value2'])
+
+                connection.set('value1', 1)
+                self.assertEqual(connection.get_versions(['value1', 'value2']), versions,
+                                 'writing the same value must not change the version')
+
+                changed, versions = connection.wait_for_change(['value1', 'value2'], timeout=0.01, since=versions)
+                self.assertEqual(changed, [])
+
+                connection.set('value2', 20)
+                changed, versions = connection.wait_for_change(['value1', 'value2'], timeout=1, since=versions)
+                self.assertEqual(changed, ['value2'], 'wait_for_change in {} is not working correctly'.format(
+                    type(connection).__name__))
+
+                received = []
+                event = threading.Event()
+                subscription = connection.subscribe(['value1'], lambda values: (received.append(values), event.set()))
+                connection.set('value2', 30)
+                connection.set('value1', 10)
+                self.assertTrue(event.wait(1), 'subscribe in {} is not working correctly'.format(type(connection).__name__))
+                connection.unsubscribe(subscription)
+                self.assertEqual(received[0], {'value1': 10})
+
+    def test_snapshot_connection(self):
+        shm = ConnectorFactory.build({'type': 'shm', 'path': 'ics_sim_snapshot_{}'.format(os.getpid()),
+                                      'name': 'fp_table'})
+        self.addCleanup(shm.unlink)
+        with tempfile.TemporaryDirectory() as folder:
+            for connection in [
+                ConnectorFactory.build({'type': 'sqlite', 'path': os.path.join(folder, 'snapshot.sqlite'), 'name': 'fp_table',
+                                        'options': {'pooled': True}}),
+                shm,
+            ]:
+                connection.initialize([('value1', 0), ('value2', 0)])
+                version, values = connection.snapshot(['value1', 'value2'])
+                self.assertEqual(values, {'value1': 0, 'value2': 0})
+
+                new_version = connection.commit({'value1': 1, 'value2': 1})
+                self.assertGreater(new_version, version)
+                self.assertEqual(connection.snapshot(['value1', 'value2']), (new_version, {'value1': 1, 'value2': 1}))
+
+                stop = threading.Event()
+
+                def commit_pairs():
+                    value = 1
+                    while not stop.is_set():
+                        value += 1
+                        connection.commit({'value1': value, 'value2': value})
+
+                thread = threading.Thread(target=commit_pairs)
+                thread.start()
+                try:
+                    for _ in range(500):
+                        version, values = connection.snapshot(['value1', 'value2'])
+                        self.assertEqual(values['value1'], values['value2'], '{} snapshot is not consistent'.format(
+                            type(connection).__name__))
+                finally:
+                    stop.set()
+                    thread.join()
+
+                connection.close()
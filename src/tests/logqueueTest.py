@@ -0,0 +1,185 @@
+import logging
+import os
+import tempfile
+import threading
+import unittest
+from logging.handlers import RotatingFileHandler
+
+from ics_sim.logqueue import LogPipeline
+from ics_sim.reporter import RateLimitedReporter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(self.format(record))
+        self.threads.add(threading.current_thread().name)
+
+
+class LogPipelineTests(unittest.TestCase):
+
+    def test_records_are_written_by_the_listener(self):
+        logger = logging.getLogger('pipeline-test')
+        logger.propagate = False
+        handler = ListHandler()
+        logger.addHandler(handler)
+
+        pipeline = LogPipeline(flush_interval=0.01)
+        pipeline.adopt(logger)
+        pipeline.start()
+        for index in range(10):
+            logger.warning('value %d', index)
+        pipeline.stop()
+
+        self.assertEqual(['value {}'.format(index) for index in range(10)], handler.records)
+        self.assertEqual({'log-pipeline'}, handler.threads, 'handler runs on the logging thread')
+        self.assertEqual(10, pipeline.get_stats()['written'])
+
+        pipeline.release()
+        self.assertEqual([handler], logger.handlers, 'release does not restore the handlers')
+
+    def test_bounded_queue_drops_and_counts(self):
+        logger = logging.getLogger('pipeline-overflow-test')
+        logger.propagate = False
+        handler = ListHandler()
+        logger.addHandler(handler)
+
+        pipeline = LogPipeline(max_queue=5)
+        pipeline.adopt(logger)
+        for index in range(8):
+            logger.error('value %d', index)
+        pipeline.console('console line')
+
+        stats = pipeline.get_stats()
+        self.assertEqual(5, stats['enqueued'])
+        self.assertEqual({'ERROR': 3, 'CONSOLE': 1}, stats['dropped'])
+        self.assertEqual(5, stats['max_depth'])
+
+        pipeline.start()
+        pipeline.stop()
+        self.assertEqual(['value {}'.format(index) for index in range(5)], handler.records)
+        pipeline.release()
+
+    def test_propagated_records_keep_their_routes(self):
+        parent, child = logging.getLogger('pipeline-parent'), logging.getLogger('pipeline-parent.child')
+        parent.propagate = False
+        parent_handler, child_handler = ListHandler(), ListHandler()
+        parent.addHandler(parent_handler)
+        child.addHandler(child_handler)
+
+        pipeline = LogPipeline(flush_interval=0.01)
+        pipeline.adopt(parent)
+        pipeline.adopt(child)
+        pipeline.start()
+        child.warning('from child')
+        parent.warning('from parent')
+        pipeline.stop()
+        pipeline.release()
+
+        self.assertEqual(['from child'], child_handler.records)
+        self.assertEqual(['from child', 'from parent'], parent_handler.records)
+
+    def test_file_handlers(self):
+        pipeline = LogPipeline(max_bytes=64, backup_count=1)
+        with tempfile.TemporaryDirectory() as folder:
+            for name, rotate in (('logs-PLC.log', True), ('snapshots_PLC.csv', False)):
+                path = os.path.join(folder, name)
+                with open(path, 'w') as file:
+                    file.write('previous run\n')
+
+                handler = pipeline.file_handler(path, mode='w', rotate=rotate)
+                handler.close()
+                self.assertEqual(rotate, isinstance(handler, RotatingFileHandler))
+                self.assertEqual(0, os.path.getsize(path), 'write mode w does not start the file over')
+
+                handler = pipeline.file_handler(path, mode='a', rotate=rotate)
+                for _ in range(2):
+                    handler.handle(logging.makeLogRecord({'msg': 'x' * 100}))
+                handler.close()
+                self.assertEqual(rotate, os.path.exists(path + '.1'), 'only text logs may rotate')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FormatCounter:
+    formatted = 0
+
+    def __str__(self):
+        FormatCounter.formatted += 1
+        return 'value'
+
+
+class RateLimitedReporterTests(unittest.TestCase):
+
+    def test_repeats_are_collapsed(self):
+        clock, lines = Clock(), []
+        reporter = RateLimitedReporter(lambda level, text: lines.append(text), window=5, clock=clock)
+
+        for _ in range(50):
+            reporter.log(logging.WARNING, 'Tank water overflowed')
+            clock.now += 0.1
+        reporter.log(logging.WARNING, 'Water is wasting')
+        self.assertEqual(['Tank water overflowed', 'Water is wasting'], lines)
+
+        clock.now += 5
+        reporter.log(logging.WARNING, 'Water is wasting')
+        self.assertEqual('Tank water overflowed (repeated 49 times in 5s)', lines[2])
+        self.assertEqual('Water is wasting', lines[3])
+        self.assertEqual({'emitted': 4, 'suppressed': 49, 'sampled_out': 0}, reporter.get_stats())
+
+    def test_formatting_is_lazy(self):
+        clock, lines = Clock(), []
+        reporter = RateLimitedReporter(lambda level, text: lines.append(text), clock=clock,
+                                       sample_every={logging.DEBUG: 10}, enabled=lambda level: level >= logging.DEBUG)
+        FormatCounter.formatted = 0
+        for _ in range(100):
+            reporter.log(logging.DEBUG, 'level %s', FormatCounter())
+            clock.now += 1
+        reporter.log(logging.NOTSET, 'not enabled %s', FormatCounter())
+
+        self.assertEqual(10, len(lines), 'DEBUG is not sampled 1 in 10')
+        self.assertEqual(10, FormatCounter.formatted, 'suppressed messages are formatted')
+
+    def test_flush_reports_pending_counts(self):
+        lines = []
+        reporter = RateLimitedReporter(lambda level, text: lines.append(text), clock=Clock())
+        for index in range(3):
+            reporter.log(logging.INFO, 'Conveyor belt started. Belt position: %.2f', index)
+        reporter.flush()
+        self.assertEqual(['Conveyor belt started. Belt position: 0.00',
+                          'Conveyor belt started. Belt position: 2.00 (repeated 2 times in 5s)'], lines)
+
+    def test_flush_from_another_thread(self):
+        lines = []
+        reporter = RateLimitedReporter(lambda level, text: lines.append(text), clock=Clock())
+        done = threading.Event()
+
+        def scan():
+            for index in range(20000):
+                reporter.log(logging.WARNING, 'value %d', index, key=index % 100)
+            done.set()
+
+        thread = threading.Thread(target=scan)
+        thread.start()
+        while not done.is_set():
+            reporter.flush()
+        thread.join()
+        reporter.flush()
+
+        # every message is either emitted or counted in exactly one summary
+        repeated = sum(int(line.split('repeated ')[1].split(' ')[0]) for line in lines if 'repeated' in line)
+        self.assertEqual(20000, len([line for line in lines if 'repeated' not in line]) + repeated)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,13 @@
+import asyncio
+import struct
 import time
 import unittest
 from ics_sim.helper import debug
 from pyModbusTCP.server import ModbusServer, DataBank
 
-from ics_sim.protocol import ClientModbus, ServerModbus, ModbusBase
+from ics_sim.protocol import ClientModbus, ServerModbus, ModbusBase, ProtocolFactory, AsyncClientModbus, ModbusTcp, \
+    UnixClientModbus
+from ics_sim.peers import PeerConnection, PeerUnavailable
 
 
 class ProtocolTests(unittest.TestCase):
@@ -24,6 +28,38 @@ class ProtocolTests(unittest.TestCase):
         number = round(number, modbus_base._precision)
         self.assertEqual(number, new_number, 'encoding and decoding is wrong ({})'.format(number))
 
+    def test_ModbusBase_many(self):
+        modbus_base = ModbusBase()
+        numbers = [0, .001, .000001, 1, 7654, 70000, 429496.7295]
+
+        # words of the original word-by-word encoder
+        expected = [[0, 0], [0, 10], [0, 0], [0, 10000], [1167, 59488], [10681, 9984], [65535, 65535]]
+        self.assertEqual(expected, [modbus_base.encode(number) for number in numbers], 'encode changed its words')
+
+        words = modbus_base.encode_many(numbers)
+        self.assertEqual([word for number_words in expected for word in number_words], words,
+                         'encode_many is not compatible with encode')
+        self.assertEqual([modbus_base.decode(words[index:index + 2]) for index in range(0, len(words), 2)],
+                         modbus_base.decode_many(words), 'decode_many is not compatible with decode')
+        self.assertEqual([0, 1], modbus_base.encode(.0001))
+        self.assertRaises(ValueError, modbus_base.decode_many, [0, 1, 2])
+
+    def test_ModbusBase_float(self):
+        numbers = [0, -1.5, 1.25, 429497.5, -2.0 ** 40, 2.0 ** 100]
+        for encoding, word_num in [(ModbusBase.ENCODING_FLOAT32, 2), (ModbusBase.ENCODING_FLOAT64, 4)]:
+            for word_order in [ModbusBase.WORD_ORDER_BIG, ModbusBase.WORD_ORDER_LITTLE]:
+                modbus_base = ModbusBase(encoding=encoding, word_order=word_order)
+                words = modbus_base.encode_many(numbers)
+                self.assertEqual(len(numbers) * word_num, len(words))
+                self.assertEqual(numbers, modbus_base.decode_many(words),
+                                 '{} {} encoding is wrong'.format(encoding, word_order))
+
+        self.assertEqual([0x3F80, 0], ModbusBase(encoding=ModbusBase.ENCODING_FLOAT32).encode(1))
+        self.assertEqual([0, 0x3F80], ModbusBase(encoding=ModbusBase.ENCODING_FLOAT32,
+                                                 word_order=ModbusBase.WORD_ORDER_LITTLE).encode(1))
+        self.assertEqual([0, 1], ModbusBase(word_order=ModbusBase.WORD_ORDER_LITTLE).encode(6.5536))
+        self.assertRaises(ValueError, ModbusBase, encoding='float16')
+
     def test_ModbusServer(self):
         server = ModbusServer('127.0.0.1', 5001, no_block=True)
         server.start()
@@ -78,6 +114,199 @@ class ProtocolTests(unittest.TestCase):
         value = round(value, server._precision)
         self.assertEqual(value, received,'test_client_server_modbus fails on tag_id={} and value={}'.format(tag_id, value))
 
+    def test_client_server_modbus_many(self):
+        client = ClientModbus('127.0.0.1', 5002)
+        server = ServerModbus('127.0.0.1', 5002)
+        server.start()
+
+        # 100 contiguous tags need two reads of at most 125 registers
+        values = {tag_id: tag_id + 0.5 for tag_id in range(100)}
+        values[150] = 7563.42
+        client.send_many(values)
+        for tag_id, value in values.items():
+            self.assertEqual(value, server.get(tag_id), 'send_many fails on tag_id={}'.format(tag_id))
+
+        server.set(3, 1.2)
+        values[3] = 1.2
+        self.assertEqual(values, client.receive_many(values.keys()), 'receive_many fails')
+
+        self.assertEqual([(0, list(range(62))), (124, list(range(62, 100))), (300, [150])],
+                         client.get_blocks(values.keys(), ClientModbus.MAX_READ_REGISTERS))
+
+        server.stop()
+        client.close()
+
+    def test_client_server_modbus_float(self):
+        client = ProtocolFactory.create_client('ModbusWriteRequest-TCP', '127.0.0.1', 5003, encoding='float64')
+        server = ProtocolFactory.create_server('ModbusWriteRequest-TCP', '127.0.0.1', 5003, encoding='float64')
+        server.start()
+
+        values = {0: -12.5, 1: 1e9 + 0.25, 5: 1.2}
+        client.send_many(values)
+        self.assertEqual(values, server.get_many(values.keys()))
+        self.assertEqual(values, client.receive_many(values.keys()))
+
+        server.stop()
+        client.close()
+
+    def test_async_client_modbus(self):
+        server = ServerModbus('127.0.0.1', 5004)
+        server.start()
+        client = ProtocolFactory.create_client('ModbusWriteRequest-TCP', '127.0.0.1', 5004, client_engine='asyncio')
+
+        client.send(3, 7563.42)
+        self.assertEqual(7563.42, server.get(3), 'AsyncClientModbus send fails')
+        self.assertEqual(7563.42, client.receive(3), 'AsyncClientModbus receive fails')
+
+        values = {tag_id: tag_id / 4 for tag_id in range(80)}
+        client.send_many(values)
+        self.assertEqual(values, client.receive_many(values.keys()), 'AsyncClientModbus batch fails')
+        client.close()
+
+        async def concurrent_reads():
+            async_client = AsyncClientModbus('127.0.0.1', 5004)
+            results = await asyncio.gather(*[async_client.receive_async(tag_id) for tag_id in range(80)])
+            async_client.close()
+            return results
+
+        self.assertEqual([values[tag_id] for tag_id in range(80)], asyncio.run(concurrent_reads()))
+
+        unreachable = AsyncClientModbus('127.0.0.1', 5009, timeout=1)
+        self.assertRaises(ConnectionError, unreachable.receive, 0)
+
+        server.stop()
+
+    def test_async_client_pipelining(self):
+        async def pipelined_reads():
+            base = ModbusBase()
+            frames = []
+
+            async def reversed_server(reader, writer):
+                # answer only once the whole window is in flight, newest first
+                while len(frames) < 8:
+                    frames.append(await ModbusTcp.read_frame(reader))
+                for transaction_id, unit_id, pdu in reversed(frames):
+                    start, count = struct.unpack('>HH', pdu[1:5])
+                    words = base.encode(start // base._word_num)
+                    writer.write(ModbusTcp.frame(transaction_id, unit_id,
+                                                 struct.pack('>BB{}H'.format(count), 3, count * 2, *words)))
+                await writer.drain()
+                writer.close()
+
+            server = await asyncio.start_server(reversed_server, '127.0.0.1', 5006)
+            client = AsyncClientModbus('127.0.0.1', 5006, window=8)
+            results = await asyncio.gather(*[client.receive_async(tag_id) for tag_id in range(8)])
+            client.close()
+            server.close()
+            return len({frame[0] for frame in frames}), results
+
+        transaction_ids, results = asyncio.run(pipelined_reads())
+        self.assertEqual(8, transaction_ids, 'AsyncClientModbus does not keep the window in flight')
+        self.assertEqual(list(range(8)), results, 'AsyncClientModbus mismatches out-of-order responses')
+
+    def test_peer_circuit_breaker(self):
+        server = ProtocolFactory.create_server('ModbusWriteRequest-TCP', '127.0.0.1', 5007, server_engine='asyncio')
+        server.start()
+        client = ProtocolFactory.create_client('ModbusWriteRequest-TCP', '127.0.0.1', 5007, timeout=0.5)
+        peer = PeerConnection('PLC', client, failure_threshold=2, backoff_min=0.1, backoff_max=0.2)
+
+        peer.send(1, 12.5)
+        self.assertEqual({1: 12.5, 2: 0}, peer.receive_many([1, 2]), 'PeerConnection receive fails')
+
+        server.stop()
+        for _ in range(2):
+            self.assertRaises(ConnectionError, peer.receive, 1)
+        self.assertTrue(peer.is_open(), 'PeerConnection circuit does not open')
+
+        start = time.perf_counter()
+        self.assertEqual(12.5, peer.receive(1), 'PeerConnection does not serve last known value')
+        self.assertRaises(PeerUnavailable, peer.send, 1, 3)
+        self.assertRaises(PeerUnavailable, peer.receive, 3)
+        self.assertLess(time.perf_counter() - start, 0.05, 'PeerConnection does not fail fast')
+
+        server = ProtocolFactory.create_server('ModbusWriteRequest-TCP', '127.0.0.1', 5007, server_engine='asyncio')
+        server.start()
+        server.set(1, 20)
+        deadline = time.time() + 5
+        while peer.is_open() and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(peer.is_open(), 'PeerConnection does not reconnect')
+        self.assertEqual(20, peer.receive(1))
+
+        stats = peer.get_stats()
+        self.assertEqual(1, stats['trips'])
+        self.assertEqual(1, stats['reconnects'])
+        self.assertEqual(1, stats['stale_reads'])
+        peer.close()
+        server.stop()
+
+    def test_peer_breaker_trips_on_writes(self):
+        # nothing listens on the port, the client reports every write as failed
+        client = ProtocolFactory.create_client('ModbusWriteRequest-TCP', '127.0.0.1', 5010, timeout=0.5)
+        peer = PeerConnection('PLC', client, failure_threshold=2, backoff_min=10, backoff_max=10)
+        for _ in range(2):
+            self.assertRaises(ConnectionError, peer.send, 1, 12.5)
+        self.assertTrue(peer.is_open(), 'failed writes do not open the circuit')
+        self.assertRaises(PeerUnavailable, peer.send, 1, 12.5)
+
+        stats = peer.get_stats()
+        self.assertEqual(2, stats['failures'])
+        self.assertEqual(1, stats['rejected_writes'])
+        peer.close()
+
+    def test_loopback_modbus(self):
+        server = ProtocolFactory.create_server('loopback', '127.0.0.1', 5008)
+        server.start()
+        client = ProtocolFactory.create_client('loopback', '127.0.0.1', 5008)
+
+        client.send(3, 7563.42)
+        self.assertEqual(7563.42, server.get(3), 'loopback send fails')
+        values = {tag_id: tag_id / 4 for tag_id in range(80)}
+        client.send_many(values)
+        self.assertEqual(values, client.receive_many(values.keys()), 'loopback batch fails')
+        self.assertEqual(0, server.get_stats()['total_connections'], 'loopback client must not use a socket')
+
+        # a client in another process reaches the server over its UNIX socket
+        remote = UnixClientModbus(server.path)
+        self.assertEqual(values, remote.receive_many(values.keys()), 'loopback UNIX socket read fails')
+        remote.send(3, 11.5)
+        self.assertEqual(11.5, client.receive(3), 'loopback UNIX socket write fails')
+        remote.close()
+
+        server.stop()
+        self.assertRaises(ConnectionError, client.receive, 3)
+        client.close()
+
+    def test_async_server_modbus(self):
+        server = ProtocolFactory.create_server('ModbusWriteRequest-TCP', '127.0.0.1', 5005, server_engine='asyncio')
+        server.start()
+
+        self.server_modbus_func(5, 10.654321, server)
+        self.client_server_modbus_func(server, ClientModbus('127.0.0.1', 5005), 3, 7563.42)
+
+        values = {tag_id: tag_id * 1.5 for tag_id in range(70)}
+        pymodbus_client = ClientModbus('127.0.0.1', 5005)
+        pymodbus_client.send_many(values)
+        self.assertEqual(values, server.get_many(values.keys()), 'AsyncServerModbus does not accept FC16 writes')
+        pymodbus_client.client.write_single_register(0, 7)
+        self.assertEqual([7], server.bank.get(0, 1), 'AsyncServerModbus does not accept FC6 writes')
+        self.assertIsNone(pymodbus_client.client.read_coils(0, 1), 'AsyncServerModbus must reject unknown functions')
+        pymodbus_client.close()
+
+        async def many_connections(count):
+            clients = [AsyncClientModbus('127.0.0.1', 5005) for _ in range(count)]
+            results = await asyncio.gather(*[client.receive_async(10) for client in clients])
+            for client in clients:
+                client.close()
+            return results
+
+        self.assertEqual([15.0] * 200, asyncio.run(many_connections(200)))
+
+        stats = server.get_stats()
+        self.assertEqual(200, stats['requests_per_function'][ModbusTcp.READ_HOLDING_REGISTERS] - 1)
+        self.assertEqual(1, stats['requests_per_function'][1])
+        server.stop()
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,162 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from ics_sim.Device import PLC, SensorConnector, ActuatorConnector
+from ics_sim.processimage import ProcessImage
+
+TAGS = {
+    'tank_level_value': {'id': 0, 'plc': 1, 'type': 'input', 'fault': 0.0, 'default': 0},
+    'tank_level_max': {'id': 1, 'plc': 1, 'type': 'output', 'fault': 0.0, 'default': 7},
+    'tank_input_valve_status': {'id': 2, 'plc': 1, 'type': 'output', 'fault': 0.0, 'default': 1},
+}
+PLCS = {1: {'name': 'ImagePLC', 'ip': '127.0.0.1', 'port': 5009, 'protocol': 'loopback'}}
+
+
+class CountingSensorConnector(SensorConnector):
+    accesses = 0
+
+    def _get(self, tag):
+        self.accesses += 1
+        return SensorConnector._get(self, tag)
+
+    def _get_many(self, tags):
+        self.accesses += 1
+        return SensorConnector._get_many(self, tags)
+
+
+class FailingSensorConnector(CountingSensorConnector):
+    """Fails the batch read with ``error`` when set; an empty dict stands for a short batch."""
+    error = None
+
+    def _get_many(self, tags):
+        if isinstance(self.error, Exception):
+            raise self.error
+        if self.error is not None:
+            return dict(self.error)
+        return CountingSensorConnector._get_many(self, tags)
+
+
+class CountingActuatorConnector(ActuatorConnector):
+    accesses = 0
+
+    def _set(self, tag, value):
+        self.accesses += 1
+        return ActuatorConnector._set(self, tag, value)
+
+    def _set_many(self, values):
+        self.accesses += 1
+        return ActuatorConnector._set_many(self, values)
+
+
+class ImagePLC(PLC):
+    def __init__(self, connection, sensor_connector=CountingSensorConnector):
+        PLC.__init__(self, 1, sensor_connector(connection), CountingActuatorConnector(connection), TAGS, PLCS)
+        self.seen = []
+
+    def _initialize_logger(self):
+        self._logger = logging.getLogger('test-' + self.name())
+
+    def _logic(self):
+        level = self._get('tank_level_value')
+        self.seen.append((level, self._get('tank_level_value'), self._get('tank_level_max')))
+        self._set('tank_input_valve_status', 1 if level < self._get('tank_level_max') else 0)
+
+    def report(self, msg, level=0):
+        pass
+
+
+class FailingPLC(ImagePLC):
+    def __init__(self, connection):
+        self.reports = []
+        ImagePLC.__init__(self, connection, FailingSensorConnector)
+
+    def report(self, msg, level=0):
+        self.reports.append(msg)
+
+
+class ProcessImageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.folder = tempfile.mkdtemp()
+        os.chdir(self.folder)
+        self.connection = {'type': 'file', 'path': os.path.join(self.folder, 'tags'), 'name': 'tags'}
+        physics = SensorConnector(self.connection)
+        physics._connector.initialize([(tag, data['default']) for tag, data in TAGS.items()])
+        self.physics = physics
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.folder)
+
+    def test_image_tables(self):
+        image = ProcessImage(['a', 'b', 'c'])
+        image.load({'a': 1, 'c': 3})
+        self.assertEqual({'a': 1, 'b': 0, 'c': 3}, image.get_many(['a', 'b', 'c']))
+        self.assertEqual({}, image.take_dirty(), 'loaded values must not be written back')
+
+        image.set('b', 2.5)
+        self.assertEqual(2.5, image.get('b'))
+        self.assertEqual({'b': 2.5}, image.take_dirty())
+        self.assertEqual({}, image.take_dirty())
+        self.assertNotIn('d', image)
+
+    def test_scan_uses_the_image(self):
+        plc = ImagePLC(self.connection)
+        plc.begin_loop()
+        try:
+            self.assertEqual(1, self.physics._get('tank_input_valve_status'), 'defaults are not written')
+            for level in (5.0, 8.0, 6.0):
+                self.physics._set('tank_level_value', level)
+                sensor, actuator = plc._sensor_connector.accesses, plc._actuator_connector.accesses
+                plc.do_cycle()
+
+                self.assertEqual((level, level, 7.0), plc.seen[-1], 'logic does not see the scan start values')
+                self.assertEqual(1, plc._sensor_connector.accesses - sensor, 'inputs are not read in one batch')
+                self.assertLessEqual(plc._actuator_connector.accesses - actuator, 1,
+                                     'outputs are not written in one batch')
+                self.assertEqual(level, plc.server.get(0), 'server input register is not synced')
+
+                valve = 1 if level < 7 else 0
+                self.assertEqual(valve, plc.server.get(2))
+                self.assertEqual(valve, self.physics._get('tank_input_valve_status'))
+
+            # a client writes an output on the server, the next scan writes it to the process
+            plc.server.set(1, 4.0)
+            plc.do_cycle()
+            self.assertEqual(4.0, self.physics._get('tank_level_max'))
+            self.assertEqual(0, self.physics._get('tank_input_valve_status'))
+            self.assertRaises(LookupError, plc._set, 'tank_level_value', 1)
+        finally:
+            plc.stop()
+
+    def test_failed_batch_keeps_the_image(self):
+        plc = FailingPLC(self.connection)
+        plc.begin_loop()
+        try:
+            self.physics._set('tank_level_value', 5.0)
+            plc.do_cycle()
+            self.assertEqual(5.0, plc.seen[-1][0])
+
+            self.physics._set('tank_level_value', 8.0)
+            for failure in (RuntimeError('store is gone'), {}):
+                plc._sensor_connector.error = failure
+                plc.do_cycle()
+                self.assertEqual(5.0, plc.seen[-1][0], 'a failed read must keep the last input value')
+                self.assertEqual(1, self.physics._get('tank_input_valve_status'))
+            self.assertTrue(any('store is gone' in report for report in plc.reports), 'read error is not reported')
+            self.assertTrue(any('tank_level_value' in report for report in plc.reports), 'short read is not reported')
+
+            plc._sensor_connector.error = None
+            plc.do_cycle()
+            self.assertEqual(8.0, plc.seen[-1][0])
+            self.assertEqual(0, self.physics._get('tank_input_valve_status'))
+        finally:
+            plc.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,342 @@
+import functools
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+import unittest
+import urllib.request
+
+from ics_sim.Device import HIL, Runnable
+from ics_sim.clock import ScaledClock, VirtualClock, get_clock, set_clock
+from ics_sim.executor import CooperativeExecutor
+from ics_sim.launcher import ProcessLauncher
+from ics_sim.lockstep import LockstepSimulation
+from ics_sim.scheduler import CycleScheduler
+from ics_sim.telemetry import CycleTelemetry, MetricsServer
+
+MS = 1000000
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def run_cycle(self, scheduler, start, duration):
+        nominal = scheduler.begin_cycle(start)
+        scheduler.end_cycle(start + duration)
+        return nominal
+
+    def test_on_time_cycles(self):
+        scheduler = CycleScheduler(10)
+        origin = scheduler.start(0)
+        deadline = scheduler.deadline_ns
+
+        for cycle in range(1, 4):
+            start = scheduler.deadline_ns + 50000
+            self.assertEqual(origin + cycle * 10, self.run_cycle(scheduler, start, 2 * MS))
+            self.assertEqual(deadline + cycle * 10 * MS, scheduler.deadline_ns, 'deadlines drift')
+
+        stats = scheduler.get_stats()
+        self.assertEqual((3, 0, 0), (stats['cycles'], stats['overruns'], stats['missed_deadlines']))
+        self.assertAlmostEqual(0.05, stats['jitter_max_ms'])
+
+    def test_skip_policy(self):
+        scheduler = CycleScheduler(10, CycleScheduler.POLICY_SKIP)
+        origin = scheduler.start(0)
+        deadline = scheduler.deadline_ns
+
+        self.run_cycle(scheduler, deadline, 25 * MS)
+        self.assertEqual(deadline + 30 * MS, scheduler.deadline_ns, 'skip does not resume on the grid')
+        self.assertEqual(origin + 40, scheduler.begin_cycle(scheduler.deadline_ns), 'skipped cycles lost in time')
+        self.assertEqual(2, scheduler.get_stats()['missed_deadlines'])
+
+    def test_catch_up_policy(self):
+        scheduler = CycleScheduler(10, CycleScheduler.POLICY_CATCH_UP)
+        origin = scheduler.start(0)
+        deadline = scheduler.deadline_ns
+
+        late = deadline + 25 * MS
+        self.run_cycle(scheduler, deadline, 25 * MS)
+        self.assertEqual(origin + 20, self.run_cycle(scheduler, late, MS))
+        self.assertEqual(origin + 30, self.run_cycle(scheduler, late + MS, MS))
+        self.assertEqual(deadline + 30 * MS, scheduler.deadline_ns, 'catch-up does not return to the grid')
+        self.assertEqual(2, scheduler.get_stats()['missed_deadlines'], 'missed deadlines counted twice')
+
+    def test_stretch_policy(self):
+        scheduler = CycleScheduler(10, CycleScheduler.POLICY_STRETCH)
+        origin = scheduler.start(0)
+        deadline = scheduler.deadline_ns
+
+        self.run_cycle(scheduler, deadline, 25 * MS)
+        self.assertEqual(deadline + 35 * MS, scheduler.deadline_ns, 'stretch does not restart the grid')
+        self.assertEqual(origin + 45, scheduler.begin_cycle(scheduler.deadline_ns))
+
+    def test_wait_holds_period(self):
+        scheduler = CycleScheduler(10)
+        scheduler.start()
+        jitter = []
+        for _ in range(21):
+            scheduler.wait()
+            scheduler.begin_cycle()
+            scheduler.end_cycle()
+            jitter.append(scheduler.get_stats()['jitter_last_ms'])
+        self.assertLess(sorted(jitter)[10], 1, 'scheduler jitter above a millisecond')
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, CycleScheduler, 10, 'later')
+
+    def test_policy_change_keeps_grid(self):
+        scheduler = CycleScheduler(10)
+        scheduler.start(0)
+        deadline = scheduler.deadline_ns
+        self.run_cycle(scheduler, deadline, 25 * MS)
+
+        scheduler.set_policy(CycleScheduler.POLICY_STRETCH)
+        self.assertEqual(deadline + 30 * MS, scheduler.deadline_ns, 'policy change moves the grid')
+        self.assertEqual(1, scheduler.get_stats()['overruns'], 'policy change loses the statistics')
+        self.assertEqual(CycleScheduler.POLICY_STRETCH, scheduler.get_stats()['policy'])
+        self.assertRaises(ValueError, scheduler.set_policy, 'later')
+
+
+class Counter(Runnable):
+    def __init__(self, name, loop, trace):
+        Runnable.__init__(self, name, loop)
+        self.trace = trace
+
+    def _initialize_logger(self):
+        self._logger = logging.getLogger('test-' + self.name())
+
+    def _before_start(self):
+        pass
+
+    def _logic(self):
+        self.trace.append(self.name())
+
+    def report(self, msg, level=0):
+        pass
+
+
+class ExecutorTests(unittest.TestCase):
+
+    def test_executor_runs_devices_at_their_periods(self):
+        trace = []
+        executor = CooperativeExecutor()
+        for name, loop in (('fast', 10), ('slow', 40), ('fast2', 10)):
+            executor.add(Counter(name, loop, trace))
+
+        executor.start()
+        time.sleep(0.5)
+        executor.stop()
+
+        self.assertAlmostEqual(4, trace.count('fast') / trace.count('slow'), delta=0.5)
+        self.assertEqual(trace.count('fast'), trace.count('fast2'))
+        # devices due together run in the order they were added
+        for index, name in enumerate(trace):
+            if name == 'fast2':
+                self.assertIn(trace[index - 1], ('fast', 'slow'))
+        self.assertEqual({'fast', 'slow', 'fast2'}, set(executor.get_stats()))
+
+
+class Crashing(Counter):
+    def _logic(self):
+        raise RuntimeError('logic failed')
+
+
+class ClockTests(unittest.TestCase):
+
+    def test_virtual_clock_scheduler(self):
+        clock = VirtualClock(epoch_ns=0)
+        scheduler = CycleScheduler(100, clock=clock)
+        self.assertEqual(0, scheduler.start())
+
+        started = time.perf_counter()
+        for cycle in range(1, 36001):
+            scheduler.wait()
+            self.assertEqual(cycle * 100, scheduler.begin_cycle())
+            scheduler.end_cycle()
+        self.assertLess(time.perf_counter() - started, 5, 'an hour of virtual time is not faster than real time')
+        self.assertEqual(3600, clock.time())
+        self.assertEqual(0, scheduler.get_stats()['jitter_max_ms'])
+
+    def test_scaled_clock(self):
+        clock = ScaledClock(100)
+        started = time.perf_counter()
+        virtual_start = clock.monotonic()
+        clock.sleep(1)
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertGreaterEqual(clock.monotonic() - virtual_start, 1)
+        self.assertRaises(ValueError, ScaledClock, 0)
+
+    def test_devices_share_the_global_clock(self):
+        previous = get_clock()
+        set_clock(VirtualClock())
+        try:
+            trace = []
+            executor = CooperativeExecutor()
+            fast, slow = Counter('fast', 10, trace), Counter('slow', 1000, trace)
+            executor.add(fast)
+            executor.add(slow)
+        finally:
+            set_clock(previous)
+        self.assertIs(executor.clock, fast.get_clock())
+        self.assertIs(fast.get_clock(), slow.get_clock())
+
+        executor.start()
+        while executor.clock.monotonic() < 60:
+            time.sleep(0.01)
+        executor.stop()
+
+        # the two devices start on different phases and the executor stops at an
+        # arbitrary point, so the slow count can be off by up to two periods
+        self.assertAlmostEqual(100 * trace.count('slow'), trace.count('fast'), delta=200)
+        self.assertGreaterEqual(trace.count('slow'), 60)
+
+
+class Plant(HIL):
+    def __init__(self, path, trace):
+        HIL.__init__(self, 'plant', {'type': 'file', 'path': path, 'name': 'plant'}, 10)
+        self._connector.initialize([('level', 0.0)])
+        self.trace = trace
+
+    def _initialize_logger(self):
+        self._logger = logging.getLogger('test-' + self.name())
+
+    def _before_start(self):
+        pass
+
+    def _logic(self):
+        level = self._get('level') + random.random()
+        self._set('level', level)
+        self.trace.append((self.name(), self._current_loop_time, level))
+
+    def report(self, msg, level=0):
+        pass
+
+
+class Controller(Counter):
+    def __init__(self, name, loop, trace, plant):
+        Counter.__init__(self, name, loop, trace)
+        self.plant = plant
+
+    def _logic(self):
+        self.trace.append((self.name(), self._current_loop_time, self.plant._get('level'), random.random()))
+
+
+class LockstepTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def simulate(self, seed, seconds=2):
+        trace = []
+        simulation = LockstepSimulation(seed)
+        try:
+            controller = Controller('controller', 20, trace, None)
+            plant = Plant(os.path.join(self.folder, 'plant.tags'), trace)
+            controller.plant = plant
+            simulation.add(controller)
+            simulation.add(plant)
+            simulation.run(seconds)
+        finally:
+            simulation.stop()
+        return trace
+
+    def test_same_seed_same_trace(self):
+        trace = self.simulate(7)
+        self.assertEqual(trace, self.simulate(7))
+        self.assertNotEqual(trace, self.simulate(8))
+        self.assertEqual(300, len(trace))
+
+    def test_plant_steps_before_controllers(self):
+        trace = self.simulate(1, 0.1)
+        self.assertEqual(['plant', 'plant', 'controller'] * 5, [entry[0] for entry in trace])
+        for index, entry in enumerate(trace):
+            if entry[0] == 'controller':
+                self.assertEqual(trace[index - 1][1:], entry[1:3], 'controller does not see the plant of its step')
+
+    def test_stop_restores_clock_and_random(self):
+        clock = get_clock()
+        random.seed(3)
+        expected = random.random()
+        random.seed(3)
+        simulation = LockstepSimulation(seed=5)
+        self.assertEqual(0, simulation.step(), 'step without devices must not fail')
+        simulation.stop()
+        self.assertIs(clock, get_clock())
+        self.assertEqual(expected, random.random(), 'random state is not restored')
+
+    def test_devices_need_the_lockstep_clock(self):
+        device = Counter('early', 10, [])
+        simulation = LockstepSimulation()
+        try:
+            self.assertRaises(ValueError, simulation.add, device)
+        finally:
+            simulation.stop()
+
+
+class LauncherTests(unittest.TestCase):
+
+    def test_process_per_device(self):
+        launcher = ProcessLauncher(telemetry_interval=0.1)
+        launcher.add('child', functools.partial(Counter, 'child', 10, []), ProcessLauncher.available_cpus()[0])
+        launcher.start()
+        time.sleep(0.6)
+
+        telemetry = launcher.get_telemetry()['child']
+        self.assertNotEqual(os.getpid(), telemetry['pid'], 'device does not run in its own process')
+        self.assertGreater(telemetry['cycles'], 20, 'device telemetry is not published')
+
+        launcher.stop()
+        self.assertEqual([0], [process.exitcode for process in launcher._processes], 'device does not stop cleanly')
+
+    def test_dead_device_ends_its_process(self):
+        launcher = ProcessLauncher(telemetry_interval=0.05)
+        launcher.add('crashing', functools.partial(Crashing, 'crashing', 10, []))
+        launcher.start()
+        launcher._processes[0].join(5)
+        self.assertEqual({'crashing': 1}, launcher.wait(), 'a dead device is not reported')
+
+
+class TelemetryTests(unittest.TestCase):
+
+    def test_ring_buffer(self):
+        telemetry = CycleTelemetry(size=100)
+        for cycle in range(250):
+            telemetry.record(cycle * 10, cycle % 10, cycle, 1.0, cycle % 50 == 0)
+
+        self.assertEqual(100, len(telemetry))
+        self.assertEqual(list(range(150, 250)), telemetry.values('logic_ms'),
+                         'ring buffer does not keep the latest cycles')
+        self.assertEqual({0.5: 5.0, 0.99: 9.0}, telemetry.percentiles('latency_ms', (0.5, 0.99)))
+        self.assertEqual(0.02, telemetry.overrun_ratio())
+        # summary totals keep counting past the buffer
+        self.assertEqual(250, telemetry.count)
+        self.assertEqual(sum(range(250)), telemetry.total('logic_ms'))
+        self.assertEqual(250.0, telemetry.total('cycle_ms'))
+        self.assertRaises(ValueError, telemetry.total, 'timestamp_ms')
+        self.assertRaises(ValueError, telemetry.total, 'overrun')
+
+    def test_metrics_endpoint(self):
+        device = Counter('metered', 10, [])
+        device.begin_loop()
+        for _ in range(5):
+            device.do_cycle()
+
+        metrics = MetricsServer(0)
+        metrics.add(device)
+        metrics.start()
+        try:
+            body = urllib.request.urlopen('http://127.0.0.1:{}/metrics'.format(metrics.port)).read().decode()
+        finally:
+            metrics.stop()
+
+        self.assertIn('ics_sim_cycles_total{device="metered"} 5', body)
+        self.assertIn('ics_sim_logic_ms{device="metered",quantile="0.99"}', body)
+        self.assertIn('ics_sim_cycle_ms_count{device="metered"} 5', body)
+
+
+if __name__ == '__main__':
+    unittest.main()